@@ -0,0 +1,206 @@
+"""Load generator for the bridge's /v1/chat/completions endpoint
+
+Runs --requests chat completions with --concurrency in flight and reports throughput,
+latency and, for streamed requests, the time to the first content token. With --pid it
+also samples the CPU and memory use of that process (the bridge) during the run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+import httpx
+
+
+@dataclass
+class Report:
+    name: str
+    requests: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    throughput: float = 0.0  # requests per second
+    latency_p50: Optional[float] = None
+    latency_p99: Optional[float] = None
+    ttft_p50: Optional[float] = None
+    ttft_p99: Optional[float] = None
+    cpu_percent: Optional[float] = None
+    rss_peak_mb: Optional[float] = None
+    error_samples: list[str] = field(default_factory=list)
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+class ProcessSampler:
+    """Samples the CPU time and resident memory of a process from /proc"""
+
+    def __init__(self, pid: int, interval: float = 0.25) -> None:
+        self.pid = pid
+        self.interval = interval
+        self.rss_peak = 0
+        self._task: Optional[asyncio.Task] = None
+        self._cpu_start = 0.0
+        self._wall_start = 0.0
+        self.cpu_percent: Optional[float] = None
+
+    def _cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        # utime and stime, fields 14 and 15 of the stat line
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def _rss(self) -> int:
+        with open(f"/proc/{self.pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    async def _sample(self) -> None:
+        while True:
+            self.rss_peak = max(self.rss_peak, self._rss())
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._cpu_start = self._cpu_seconds()
+        self._wall_start = time.perf_counter()
+        self._task = asyncio.create_task(self._sample())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        wall = time.perf_counter() - self._wall_start
+        self.cpu_percent = 100 * (self._cpu_seconds() - self._cpu_start) / wall if wall else None
+
+
+async def one_request(client: httpx.AsyncClient, body: dict, stream: bool) -> tuple[float, Optional[float]]:
+    """Returns the latency and, for streams, the time to the first content token"""
+    started = time.perf_counter()
+    ttft = None
+
+    if not stream:
+        response = await client.post("/v1/chat/completions", json=body)
+        response.raise_for_status()
+        response.json()
+        return time.perf_counter() - started, None
+
+    async with client.stream("POST", "/v1/chat/completions", json={**body, "stream": True}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if ttft is not None or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                continue
+            delta = json.loads(data)["choices"][0]["delta"]
+            if delta.get("content"):
+                ttft = time.perf_counter() - started
+
+    return time.perf_counter() - started, ttft
+
+
+async def run_load(
+    url: str,
+    concurrency: int,
+    requests: int,
+    stream: bool,
+    model: str = "mock",
+    pid: Optional[int] = None,
+    name: Optional[str] = None,
+) -> Report:
+    body = {"model": model, "messages": [{"role": "user", "content": "benchmark"}]}
+    report = Report(name=name or ("stream" if stream else "non-stream"))
+    latencies: list[float] = []
+    ttfts: list[float] = []
+    remaining = iter(range(requests))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=300) as client:
+
+        async def worker():
+            for _ in remaining:
+                try:
+                    latency, ttft = await one_request(client, body, stream)
+                except Exception as e:
+                    report.errors += 1
+                    if len(report.error_samples) < 5:
+                        report.error_samples.append(repr(e))
+                    continue
+
+                latencies.append(latency)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+        sampler = ProcessSampler(pid) if pid is not None else None
+        if sampler is not None:
+            sampler.start()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        report.seconds = time.perf_counter() - started
+
+        if sampler is not None:
+            sampler.stop()
+            report.cpu_percent = sampler.cpu_percent
+            report.rss_peak_mb = sampler.rss_peak / 2**20
+
+    report.requests = len(latencies)
+    report.throughput = report.requests / report.seconds if report.seconds else 0.0
+    report.latency_p50 = percentile(latencies, 50)
+    report.latency_p99 = percentile(latencies, 99)
+    report.ttft_p50 = percentile(ttfts, 50)
+    report.ttft_p99 = percentile(ttfts, 99)
+    return report
+
+
+def format_reports(reports: list[Report]) -> str:
+    def ms(value: Optional[float]) -> str:
+        return f"{value * 1000:.1f}" if value is not None else "-"
+
+    def num(value: Optional[float]) -> str:
+        return f"{value:.1f}" if value is not None else "-"
+
+    header = ("scenario", "ok", "err", "req/s", "p50 ms", "p99 ms", "ttft p50", "ttft p99", "cpu %", "rss MB")
+    rows = [header] + [
+        (
+            r.name, str(r.requests), str(r.errors), num(r.throughput), ms(r.latency_p50), ms(r.latency_p99),
+            ms(r.ttft_p50), ms(r.ttft_p99), num(r.cpu_percent), num(r.rss_peak_mb),
+        )
+        for r in reports
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ["  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows]
+    for r in reports:
+        lines.extend(f"{r.name}: {sample}" for sample in r.error_samples)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:9000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--model", default="mock")
+    parser.add_argument("--pid", type=int, help="process to sample CPU and memory of")
+    parser.add_argument("--json", action="store_true", help="print the report as json")
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run_load(args.url, args.concurrency, args.requests, args.stream, args.model, args.pid)
+    )
+    print(json.dumps(asdict(report)) if args.json else format_reports([report]))
+
+
+if __name__ == "__main__":
+    main()
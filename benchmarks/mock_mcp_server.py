@@ -0,0 +1,80 @@
+"""A mock MCP server for benchmarking the bridge, over stdio or SSE
+
+It exposes --tools tools named <prefix>_<n>. Every call waits --latency seconds and
+returns --payload-bytes of text.
+"""
+
+import argparse
+
+import anyio
+import mcp.types as types
+from mcp.server import Server
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9200, help="port of the SSE transport")
+    parser.add_argument("--prefix", default="bench", help="prefix of the tool names")
+    parser.add_argument("--tools", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every call takes")
+    parser.add_argument("--payload-bytes", type=int, default=1024, help="size of every result")
+    return parser.parse_args()
+
+
+args = parse_args()
+server = Server(f"benchmark-{args.prefix}")
+payload = ("x" * 63 + "\n") * (args.payload_bytes // 64) + "x" * (args.payload_bytes % 64)
+
+
+@server.list_tools()
+async def list_tools() -> list[types.Tool]:
+    return [
+        types.Tool(
+            name=f"{args.prefix}_{index}",
+            description=f"benchmark tool {index}, returns {args.payload_bytes} bytes",
+            inputSchema={"type": "object", "properties": {"query": {"type": "string"}}},
+        )
+        for index in range(args.tools)
+    ]
+
+
+@server.call_tool()
+async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
+    if args.latency:
+        await anyio.sleep(args.latency)
+    return [types.TextContent(type="text", text=payload)]
+
+
+async def run_stdio():
+    from mcp.server.stdio import stdio_server
+
+    async with stdio_server() as (read_stream, write_stream):
+        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+
+def run_sse():
+    import uvicorn
+    from mcp.server.sse import SseServerTransport
+    from starlette.applications import Starlette
+    from starlette.routing import Mount, Route
+
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        async with sse.connect_sse(request.scope, request.receive, request._send) as streams:
+            await server.run(streams[0], streams[1], server.create_initialization_options())
+
+    app = Starlette(routes=[
+        Route("/sse", endpoint=handle_sse),
+        Mount("/messages/", app=sse.handle_post_message),
+    ])
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    if args.transport == "stdio":
+        anyio.run(run_stdio)
+    else:
+        run_sse()
@@ -0,0 +1,137 @@
+"""A mock OpenAI compatible inference server for benchmarking the bridge
+
+It answers /v1/chat/completions, streamed or not. For the first --tool-rounds turns
+of a conversation it asks for --tool-calls tool calls, picking tools round robin from
+the tools in the request, and after that it answers with --tokens content tokens.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--tokens", type=int, default=64, help="content tokens in the final answer")
+    parser.add_argument(
+        "--token-rate", type=float, default=0, help="tokens per second when streaming, 0 is unthrottled"
+    )
+    parser.add_argument(
+        "--first-token-latency", type=float, default=0.0, help="seconds before the first chunk"
+    )
+    parser.add_argument("--tool-calls", type=int, default=1, help="tool calls per tool round")
+    parser.add_argument("--tool-rounds", type=int, default=1, help="tool rounds before answering")
+    parser.add_argument("--tool-arguments", default="{}", help="json arguments of every tool call")
+    return parser.parse_args()
+
+
+args = parse_args()
+
+
+def completion_id() -> str:
+    return f"chatcmpl-{time.monotonic_ns()}"
+
+
+def plan(body: dict) -> list[dict]:
+    """The tool calls to make for this turn, empty when it is time to answer"""
+    tools = [tool["function"]["name"] for tool in body.get("tools") or []]
+    rounds = sum(1 for message in body["messages"] if message.get("tool_calls"))
+    if not tools or rounds >= args.tool_rounds:
+        return []
+
+    return [
+        {
+            "id": f"call_{rounds}_{index}",
+            "type": "function",
+            "function": {"name": tools[(rounds * args.tool_calls + index) % len(tools)], "arguments": args.tool_arguments},
+        }
+        for index in range(args.tool_calls)
+    ]
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    tool_calls = plan(body)
+    model = body.get("model", "mock")
+
+    if not body.get("stream"):
+        await asyncio.sleep(args.first_token_latency)
+        if tool_calls:
+            message = {"role": "assistant", "content": None, "tool_calls": tool_calls}
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": "tok " * args.tokens}
+            finish_reason = "stop"
+
+        return JSONResponse({
+            "id": completion_id(),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": args.tokens, "total_tokens": args.tokens + 1},
+        })
+
+    chunk_id = completion_id()
+
+    def chunk(delta: dict, finish_reason=None) -> str:
+        return "data: " + json.dumps({
+            "id": chunk_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+        }) + "\n\n"
+
+    async def stream():
+        await asyncio.sleep(args.first_token_latency)
+        yield chunk({"role": "assistant", "content": ""})
+
+        if tool_calls:
+            # the arguments are split over two chunks, like real servers do
+            for index, call in enumerate(tool_calls):
+                arguments = call["function"]["arguments"]
+                half = len(arguments) // 2
+                yield chunk({"tool_calls": [{
+                    "index": index, "id": call["id"], "type": "function",
+                    "function": {"name": call["function"]["name"], "arguments": arguments[:half]},
+                }]})
+                yield chunk({"tool_calls": [{"index": index, "function": {"arguments": arguments[half:]}}]})
+            yield chunk({}, "tool_calls")
+
+        else:
+            delay = 1 / args.token_rate if args.token_rate > 0 else 0
+            for _ in range(args.tokens):
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk({"content": "tok "})
+            yield chunk({}, "stop")
+
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+
+async def models(request: Request):
+    return JSONResponse({
+        "object": "list",
+        "data": [{"id": "mock", "object": "model", "created": 0, "owned_by": "benchmarks"}],
+    })
+
+
+app = Starlette(routes=[
+    Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+    Route("/v1/models", models),
+])
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
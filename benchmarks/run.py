@@ -0,0 +1,146 @@
+"""Runs the bridge against the mock servers and reports how it performs
+
+Starts the mock inference server, a mock SSE MCP server and the bridge (configured
+with that server plus a mock stdio MCP server), then drives streamed and non streamed
+chat completions through it with the load generator.
+
+    python benchmarks/run.py --concurrency 32 --requests 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+import httpx
+
+from loadgen import format_reports, run_load
+
+HERE = Path(__file__).resolve().parent
+BRIDGE = HERE.parent / "mcp_bridge"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--scenarios", default="non-stream,stream", help="comma separated, non-stream and/or stream")
+    parser.add_argument("--bridge-port", type=int, default=9000)
+    parser.add_argument("--openai-port", type=int, default=9100)
+    parser.add_argument("--mcp-port", type=int, default=9200)
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--token-rate", type=float, default=0)
+    parser.add_argument("--first-token-latency", type=float, default=0.0)
+    parser.add_argument("--tool-calls", type=int, default=2)
+    parser.add_argument("--tool-rounds", type=int, default=1)
+    parser.add_argument("--tools", type=int, default=8, help="tools per mock MCP server")
+    parser.add_argument("--tool-latency", type=float, default=0.0)
+    parser.add_argument("--payload-bytes", type=int, default=1024)
+    parser.add_argument("--bridge-config", help="json merged into the generated bridge config")
+    parser.add_argument("--json", action="store_true", help="print the reports as json")
+    return parser.parse_args()
+
+
+def bridge_config(args) -> dict:
+    mcp_server = [
+        str(HERE / "mock_mcp_server.py"),
+        "--tools", str(args.tools),
+        "--latency", str(args.tool_latency),
+        "--payload-bytes", str(args.payload_bytes),
+    ]
+    config = {
+        "inference_server": {"base_url": f"http://127.0.0.1:{args.openai_port}/v1", "api_key": "none"},
+        "mcp_servers": {
+            "stdio": {"command": sys.executable, "args": mcp_server + ["--prefix", "stdio"]},
+            "sse": {"url": f"http://127.0.0.1:{args.mcp_port}/sse"},
+        },
+        "network": {"host": "127.0.0.1", "port": args.bridge_port},
+        "logging": {"log_level": "INFO"},
+    }
+    if args.bridge_config:
+        for key, value in json.loads(args.bridge_config).items():
+            config[key] = {**config.get(key, {}), **value} if isinstance(value, dict) else value
+    return config
+
+
+async def wait_until_ready(url: str, servers: list[str], timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.monotonic() < deadline:
+            try:
+                statuses = [
+                    (await client.get(f"/mcp/servers/{server}/status")).json() for server in servers
+                ]
+                if all(status.get("online") for status in statuses):
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(0.25)
+    raise TimeoutError("the bridge did not come up")
+
+
+def main():
+    args = parse_args()
+    config = bridge_config(args)
+    processes: list[subprocess.Popen] = []
+
+    try:
+        processes.append(subprocess.Popen([
+            sys.executable, str(HERE / "mock_openai.py"),
+            "--port", str(args.openai_port),
+            "--tokens", str(args.tokens),
+            "--token-rate", str(args.token_rate),
+            "--first-token-latency", str(args.first_token_latency),
+            "--tool-calls", str(args.tool_calls),
+            "--tool-rounds", str(args.tool_rounds),
+        ]))
+        processes.append(subprocess.Popen([
+            sys.executable, str(HERE / "mock_mcp_server.py"),
+            "--transport", "sse",
+            "--port", str(args.mcp_port),
+            "--prefix", "sse",
+            "--tools", str(args.tools),
+            "--latency", str(args.tool_latency),
+            "--payload-bytes", str(args.payload_bytes),
+        ]))
+        time.sleep(1)  # let the mock servers bind before the bridge connects
+
+        env = {
+            **os.environ,
+            "MCP_BRIDGE__CONFIG__FILE": "",
+            "MCP_BRIDGE__CONFIG__JSON": json.dumps(config),
+        }
+        bridge = subprocess.Popen([sys.executable, "main.py"], cwd=BRIDGE, env=env)
+        processes.append(bridge)
+
+        url = f"http://127.0.0.1:{args.bridge_port}"
+        asyncio.run(wait_until_ready(url, list(config["mcp_servers"])))
+
+        reports = []
+        for scenario in args.scenarios.split(","):
+            reports.append(asyncio.run(run_load(
+                url, args.concurrency, args.requests, scenario == "stream", pid=bridge.pid, name=scenario,
+            )))
+
+        if args.json:
+            print(json.dumps([asdict(report) for report in reports], indent=2))
+        else:
+            print(format_reports(reports))
+
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Microbenchmark of attaching a large tool catalog to chat completion requests
+
+Fills the catalog with --tools tools and times what each request pays to get them
+into its body: converting and dumping every tool (how the bridge used to do it),
+building a bundle from cached fragments after a catalog change, and reusing a
+memoized bundle.
+
+    python benchmarks/tool_payloads.py --tools 1000
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+BRIDGE = Path(__file__).resolve().parent.parent / "mcp_bridge"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tools", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200)
+    return parser.parse_args()
+
+
+def make_tools(count: int, generation: int = 0) -> list:
+    from mcp.types import Tool
+
+    return [
+        Tool(
+            name=f"tool_{i}",
+            description=f"Tool number {i} of the benchmark catalog, generation {generation}",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "what to look for"},
+                    "limit": {"type": "integer", "description": "maximum number of results"},
+                },
+                "required": ["query"],
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def timed(iterations: int, run) -> float:
+    """Mean seconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        run()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    args = parse_args()
+
+    # the bridge imports its modules from its own directory and loads its config,
+    # command line included, on import
+    sys.path.insert(0, str(BRIDGE))
+    sys.argv = sys.argv[:1]
+    os.environ.setdefault("MCP_BRIDGE__CONFIG__FILE", "")
+    os.environ.setdefault("MCP_BRIDGE__CONFIG__JSON", "{}")
+
+    from mcp_clients.McpCatalog import catalog
+    from openai_clients import jsonCodec
+    from openai_clients.toolPayloads import encode_request, tool_payloads
+    from tool_mappers import mcp2openai
+
+    request = {"model": "mock", "messages": [{"role": "user", "content": "hello"}]}
+    catalog.set_tools("bench", make_tools(args.tools))
+
+    def convert_every_time():
+        body = dict(request)
+        body["tools"] = [
+            mcp2openai(tool).model_dump(mode="json", exclude_none=True) for tool in catalog.get_tools()
+        ]
+        jsonCodec.dumps(body)
+
+    def bundle_from_fragments():
+        tool_payloads.bundles.clear()
+        encode_request(request, tool_payloads.bundle(catalog.get_tools()))
+
+    def memoized_bundle():
+        encode_request(request, tool_payloads.bundle(catalog.get_tools()))
+
+    generation = 0
+
+    def after_catalog_change():
+        # one server re-lists its tools with a single one redefined
+        nonlocal generation
+        generation += 1
+        tools = list(catalog.get_tools())
+        tools[0] = make_tools(1, generation)[0]
+        catalog.set_tools("bench", tools)
+        encode_request(request, tool_payloads.bundle(catalog.get_tools()))
+
+    tool_payloads.bundle(catalog.get_tools())  # warm the fragments
+
+    results = [
+        ("convert every request", timed(args.iterations, convert_every_time)),
+        ("bundle from fragments", timed(args.iterations, bundle_from_fragments)),
+        ("memoized bundle", timed(args.iterations, memoized_bundle)),
+        ("after one tool changed", timed(args.iterations, after_catalog_change)),
+    ]
+
+    size = len(tool_payloads.bundle(catalog.get_tools()))
+    print(f"{args.tools} tools, {size / 1024:.0f} KiB of tool json, orjson {'on' if jsonCodec.fast else 'off'}")
+    width = max(len(name) for name, _ in results)
+    for name, seconds in results:
+        print(f"{name.rjust(width)}  {seconds * 1000:8.3f} ms per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from .initial import initial_settings
 from .final import Settings
+from .logs import configure_logging
 from typing import Any, Callable
 from loguru import logger
 from pydantic import ValidationError
@@ -11,7 +12,6 @@ config: Settings = None  # type: ignore
 if initial_settings.load_config:
     # import stuff needed to load the config
     from deepmerge import always_merger
-    import sys
 
     configs: list[dict[str, Any]] = []
     load_config: Callable[[str], dict]  # without this mypy will error about param names
@@ -47,11 +47,4 @@ if initial_settings.load_config:
             logger.error(f"{error['loc'][0]}: {error['msg']}")
         exit(1)
 
-    if config.logging.log_level != "DEBUG":
-        logger.remove()
-        logger.add(
-            sys.stderr,
-            format="{time} {level} {message}",
-            level=config.logging.log_level,
-            colorize=True,
-        )
+    configure_logging(config.logging)
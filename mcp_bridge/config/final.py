@@ -1,10 +1,28 @@
 from typing import Annotated, Literal, Union
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 from mcp.client.stdio import StdioServerParameters
 
 
+class Timeouts(BaseModel):
+    connect: float | None = Field(10, description="seconds to wait for a connection to be established")
+    read: float | None = Field(600, description="seconds to wait for a chunk of the response")
+    write: float | None = Field(60, description="seconds to wait for a chunk of the request to be sent")
+    pool: float | None = Field(30, description="seconds to wait for a free connection in the pool")
+
+
+class Upstream(BaseModel):
+    base_url: str = Field(description="Base URL of the inference server")
+    api_key: str = Field(
+        default="unauthenticated", description="API key for the inference server"
+    )
+    models: list[str] = Field(
+        default_factory=list,
+        description="models served by this inference server, empty means any model",
+    )
+
+
 class InferenceServer(BaseModel):
     base_url: str = Field(
         default="http://localhost:11434/v1",
@@ -13,30 +31,290 @@ class InferenceServer(BaseModel):
     api_key: str = Field(
         default="unauthenticated", description="API key for the inference server"
     )
+    upstreams: list[Upstream] = Field(
+        default_factory=list,
+        description="inference servers to route between, base_url and api_key are used when empty",
+    )
+    balancing: Literal["least_outstanding", "ewma"] = Field(
+        "least_outstanding",
+        description="pick the upstream with the fewest requests in flight, or the lowest latency weighted by load",
+    )
+    max_failures: int = Field(
+        3, ge=1, description="consecutive failures before an upstream is ejected"
+    )
+    ejection_seconds: float = Field(
+        30, ge=0, description="seconds an ejected upstream is skipped"
+    )
+    max_connections: int = Field(
+        200, ge=1, description="maximum number of connections to each inference server"
+    )
+    max_keepalive_connections: int = Field(
+        50, ge=0, description="maximum number of idle connections kept open"
+    )
+    keepalive_expiry: float = Field(
+        30, ge=0, description="seconds an idle connection is kept open"
+    )
+    http2: bool = Field(
+        False, description="use HTTP/2, requires the http2 extra to be installed"
+    )
+    timeouts: Timeouts = Field(
+        default_factory=lambda: Timeouts.model_construct(),
+        description="timeouts for requests to the inference server",
+    )
 
 
 class Logging(BaseModel):
-    log_level: Literal["INFO", "DEBUG"] = Field("INFO", description="default log level")
+    log_level: Literal["TRACE", "DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR", "CRITICAL"] = Field(
+        "INFO", description="default log level"
+    )
     log_server_pings: bool = Field(False, description="log server pings")
+    debug_sample_rate: float = Field(
+        0, ge=0, le=1, description="fraction of requests logged at debug level whatever the log level"
+    )
+    debug_header: str | None = Field(
+        None, description='requests with this header set to "true" are logged at debug level'
+    )
+    enqueue: bool = Field(
+        True, description="write logs from a background thread so they never block requests"
+    )
 
 
-class SSEMCPServer(BaseModel):
+class ToolCache(BaseModel):
+    ttl: float = Field(300, gt=0, description="seconds a cached result stays valid")
+    tool_ttl: dict[str, float] = Field(
+        default_factory=dict, description="per tool overrides of the ttl"
+    )
+    tools: list[str] | None = Field(
+        default=None, description="tools whose results are cached, every tool of the server when not set"
+    )
+    max_entries: int = Field(1024, ge=1, description="maximum number of cached results")
+    max_bytes: int = Field(
+        16 * 1024 * 1024, ge=1, description="maximum total size of the cached results"
+    )
+
+
+class ResourceCache(BaseModel):
+    ttl: float = Field(
+        60, gt=0, description="seconds cached contents stay valid, also when the server reports updates"
+    )
+    max_entries: int = Field(256, ge=1, description="maximum number of cached resources")
+    max_bytes: int = Field(
+        16 * 1024 * 1024, ge=1, description="maximum total size of the cached contents"
+    )
+    subscribe: bool = Field(
+        True, description="subscribe to cached resources so updates drop them, when the server supports it"
+    )
+
+
+class MCPServerOptions(BaseModel):
+    tool_cache: ToolCache | None = Field(
+        default=None, description="cache results of idempotent tools, disabled when not set"
+    )
+    resource_cache: ResourceCache | None = Field(
+        default=None, description="cache contents of read resources, disabled when not set"
+    )
+    cancel_notifications: bool = Field(
+        True,
+        description="send notifications/cancelled for abandoned tool calls, turn off for servers that fail on it",
+    )
+
+
+class ReplicaOptions(BaseModel):
+    min_replicas: int = Field(1, ge=1, description="number of server instances kept running")
+    max_replicas: int = Field(
+        1, ge=1, description="number of server instances the pool may grow to while calls queue up"
+    )
+    replica_idle_seconds: float = Field(
+        300, gt=0, description="seconds an extra instance may sit idle before it is stopped"
+    )
+
+    @model_validator(mode="after")
+    def check_replicas(self):
+        if self.max_replicas < self.min_replicas:
+            raise ValueError("max_replicas must not be smaller than min_replicas")
+        return self
+
+
+class StdioMCPServer(StdioServerParameters, MCPServerOptions, ReplicaOptions):
+    pass
+
+
+class SSEMCPServer(MCPServerOptions):
     # TODO: expand this once I find a good definition for this
     url: str = Field(description="URL of the MCP server")
 
-class DockerMCPServer(BaseModel):
+class DockerMCPServer(MCPServerOptions, ReplicaOptions):
     container_name: str | None = Field(default=None, description="Name of the docker container")
     image: str = Field(description="Image of the docker container")
     args: list[str] = Field(default_factory=list, description="Command line arguments for the docker container")
     env: dict[str, str] = Field(default_factory=dict, description="Environment variables for the docker container")
+    pull_policy: Literal["always", "if-not-present", "never"] = Field(
+        "if-not-present", description="when to pull the image before creating a container"
+    )
+    standby_containers: int = Field(
+        0, ge=0, description="number of started containers kept ready for the next connect"
+    )
+    max_message_bytes: int = Field(
+        64 * 1024 * 1024, gt=0, description="largest message accepted from the container"
+    )
+    message_buffer: int = Field(
+        32, ge=0, description="number of messages buffered in each direction between the container and the session"
+    )
+
+    @model_validator(mode="after")
+    def check_container_name(self):
+        # a named container can only exist once
+        if self.container_name is not None and self.standby_containers > 0:
+            raise ValueError("standby_containers cannot be used together with container_name")
+        if self.container_name is not None and self.max_replicas > 1:
+            raise ValueError("max_replicas cannot be used together with container_name")
+        return self
 
 
 MCPServer = Annotated[
-    Union[StdioServerParameters, SSEMCPServer, DockerMCPServer],
+    Union[StdioMCPServer, SSEMCPServer, DockerMCPServer],
     Field(description="MCP server configuration"),
 ]
 
 
+class ToolCalls(BaseModel):
+    max_concurrency: int = Field(
+        16, ge=1, description="maximum number of tool calls running at once across all requests"
+    )
+    max_concurrency_per_server: int = Field(
+        4, ge=1, description="maximum number of tool calls running at once on a single MCP server"
+    )
+
+
+class AgentLoop(BaseModel):
+    deadline: float | None = Field(
+        None, gt=0, description="seconds a chat completion request may take, unlimited when not set"
+    )
+    deadline_header: str = Field(
+        "X-MCP-Bridge-Deadline",
+        description="header with a deadline in seconds for one request, it can only shorten the configured one",
+    )
+    max_iterations: int | None = Field(
+        None, ge=1, description="inference server rounds per request, unlimited when not set"
+    )
+    budget_message: str = Field(
+        "The request reached its time or step limit before the answer was complete.",
+        description="answer sent when a request runs out of time or rounds without a final answer",
+    )
+
+
+class ToolSelection(BaseModel):
+    top_k: int | None = Field(
+        None, ge=1, description="number of tools sent with a request, every tool when not set"
+    )
+    always_include: list[str] = Field(
+        default_factory=list, description="tools sent with every request on top of the top_k"
+    )
+    recent_messages: int = Field(
+        4, ge=1, description="number of latest messages the tools are matched against"
+    )
+    header: str = Field(
+        "X-MCP-Bridge-Tools",
+        description='per request override: "all", a number of tools or a comma separated list of tool names',
+    )
+
+
+TruncationStrategy = Literal["head", "tail", "middle"]
+
+
+class ToolResults(BaseModel):
+    unit: Literal["bytes", "tokens"] = Field(
+        "bytes", description="unit of the budgets, tokens are estimated as 4 bytes each"
+    )
+    max_size: int | None = Field(
+        None, ge=1, description="largest tool result fed back to the model, unlimited when not set"
+    )
+    tool_max_size: dict[str, int] = Field(
+        default_factory=dict, description="per tool overrides of max_size"
+    )
+    request_max_size: int | None = Field(
+        None, ge=1, description="total size of the tool results of one request, unlimited when not set"
+    )
+    strategy: TruncationStrategy = Field(
+        "middle", description="which part of a long result is kept: head, tail or both ends (middle)"
+    )
+    tool_strategy: dict[str, TruncationStrategy] = Field(
+        default_factory=dict, description="per tool overrides of the strategy"
+    )
+    store_ttl: float = Field(
+        3600, gt=0, description="seconds the full version of a truncated result stays available"
+    )
+    store_max_bytes: int = Field(
+        64 * 1024 * 1024, ge=1, description="maximum total size of the stored full results"
+    )
+
+
+class Sessions(BaseModel):
+    connect_wait: float = Field(
+        5, gt=0, description="seconds a request waits for a server that is reconnecting"
+    )
+    initialize_timeout: float = Field(
+        30, gt=0, description="seconds a server may take to answer the initialize request"
+    )
+    list_timeout: float = Field(
+        2, gt=0, description="seconds each server gets to answer a listing that spans all servers"
+    )
+    relist_interval: float = Field(
+        10, ge=0, description="shortest time in seconds between listing every server's resources for an unknown uri"
+    )
+    backoff_initial: float = Field(0.5, gt=0, description="seconds before the first reconnect")
+    backoff_max: float = Field(60, gt=0, description="longest wait between reconnects")
+    backoff_multiplier: float = Field(2, ge=1, description="growth of the wait after each failed reconnect")
+    backoff_jitter: float = Field(
+        0.2, ge=0, le=1, description="fraction by which each wait is randomly shortened or lengthened"
+    )
+    failure_threshold: int = Field(
+        5, ge=1, description="failed connects in a row after which calls to the server fail immediately"
+    )
+
+
+class ServerSessions(BaseModel):
+    max_sessions: int | None = Field(
+        None, ge=1, description="maximum number of connected SSE clients, more are turned away with a 503"
+    )
+    idle_timeout: float | None = Field(
+        None, gt=0, description="seconds without a message after which a client's session is closed"
+    )
+    buffer_size: int = Field(
+        16, ge=0, description="number of messages buffered in each direction of a session"
+    )
+
+
+class Tracing(BaseModel):
+    exporter: str = Field(
+        "none",
+        description='where traces go: "none", "stdout", "file" or a "package.module:ClassName" exporter',
+    )
+    file: str = Field("traces.jsonl", description="file the file exporter appends to")
+    request_id_header: str = Field(
+        "X-Request-ID", description="header carrying the request id, it is forwarded upstream"
+    )
+    server_timing: bool = Field(True, description="add a Server-Timing header to responses")
+
+
+class ChatCompletions(BaseModel):
+    validate_body: bool = Field(
+        True,
+        description="validate request bodies against the OpenAI schema, turn off to only read the messages and tools and leave validation to the inference server",
+    )
+
+
+class Passthrough(BaseModel):
+    header: str = Field(
+        "X-MCP-Bridge-Passthrough",
+        description='requests with this header set to "true" are forwarded without tools',
+    )
+    models: list[str] = Field(
+        default_factory=list,
+        description="models whose requests are always forwarded without tools",
+    )
+
+
 class Network(BaseModel):
     host: str = Field("0.0.0.0", description="Host of the network")
     port: int = Field(8000, description="Port of the network")
@@ -62,6 +340,51 @@ class Settings(BaseSettings):
         description="network config",
     )
 
+    tool_calls: ToolCalls = Field(
+        default_factory=lambda: ToolCalls.model_construct(),
+        description="tool call config",
+    )
+
+    agent_loop: AgentLoop = Field(
+        default_factory=lambda: AgentLoop.model_construct(),
+        description="time and round limits of chat completion requests",
+    )
+
+    tool_selection: ToolSelection = Field(
+        default_factory=lambda: ToolSelection.model_construct(),
+        description="choice of the tools sent with each request",
+    )
+
+    tool_results: ToolResults = Field(
+        default_factory=lambda: ToolResults.model_construct(),
+        description="size budgets for tool results fed back to the model",
+    )
+
+    sessions: Sessions = Field(
+        default_factory=lambda: Sessions.model_construct(),
+        description="MCP session reconnect config",
+    )
+
+    server_sessions: ServerSessions = Field(
+        default_factory=lambda: ServerSessions.model_construct(),
+        description="sessions of the clients of the bridge MCP server",
+    )
+
+    tracing: Tracing = Field(
+        default_factory=lambda: Tracing.model_construct(),
+        description="request tracing config",
+    )
+
+    chat_completions: ChatCompletions = Field(
+        default_factory=lambda: ChatCompletions.model_construct(),
+        description="handling of chat completion request bodies",
+    )
+
+    passthrough: Passthrough = Field(
+        default_factory=lambda: Passthrough.model_construct(),
+        description="forwarding of requests that need no MCP tools",
+    )
+
     model_config = SettingsConfigDict(
         env_prefix="MCP_BRIDGE__",
         env_file=".env",
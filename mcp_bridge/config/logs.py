@@ -0,0 +1,49 @@
+import sys
+from contextvars import ContextVar
+from loguru import logger
+from .final import Logging
+
+__all__ = ["configure_logging", "debug_enabled", "debug_sampled"]
+
+# set by the tracing middleware for requests picked for debug logging
+debug_sampled: ContextVar[bool] = ContextVar("debug_sampled", default=False)
+
+_debug_everywhere: bool = False
+
+
+def debug_enabled() -> bool:
+    """Whether debug records of the current request are emitted
+
+    Hot paths check this before logging anything that is costly to build, such as
+    every chunk of a stream.
+    """
+    return _debug_everywhere or debug_sampled.get()
+
+
+def configure_logging(settings: Logging) -> None:
+    """Replace the default sink with one that writes from a background thread"""
+    global _debug_everywhere
+
+    level = logger.level(settings.log_level).no
+    debug = logger.level("DEBUG").no
+    _debug_everywhere = level <= debug
+
+    sampling = settings.debug_sample_rate > 0 or settings.debug_header is not None
+
+    def keep(record) -> bool:
+        # sampled requests let their debug records through a sink set to a higher level
+        return record["level"].no >= level or debug_sampled.get()
+
+    options: dict = {}
+    if not _debug_everywhere:
+        options["format"] = "{time} {level} {message}"
+
+    logger.remove()
+    logger.add(
+        sys.stderr,
+        level=min(level, debug) if sampling else level,
+        filter=keep,
+        colorize=True,
+        enqueue=settings.enqueue,  # disk and terminal writes never block the event loop
+        **options,
+    )
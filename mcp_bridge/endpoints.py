@@ -1,19 +1,73 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Awaitable
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from loguru import logger
+from pydantic import BaseModel, ValidationError
 
 from lmos_openai_types import CreateChatCompletionRequest, CreateCompletionRequest
 
 from openai_clients import (
-    client,
+    upstreams,
     completions,
     chat_completions,
     streaming_chat_completions,
+    passthrough_chat_completions,
+    RequestBudget,
+    wants_passthrough,
+    jsonCodec,
 )
 
+from config import config
+from metrics import abandoned_requests
 from openapi_tags import Tag
 
 router = APIRouter(prefix="/v1", tags=[Tag.openai])
 
 
+def body_schema(model: type[BaseModel], path: str) -> dict:
+    """openapi_extra for a body that is read by hand but documented by a model
+
+    The schema is given inline, so its definitions are referenced where they sit
+    in the document.
+    """
+    pointer = "/paths/" + path.replace("~", "~0").replace("/", "~1") + "/post/requestBody/content/application~1json/schema"
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": model.model_json_schema(ref_template="#" + pointer + "/$defs/{model}")
+                }
+            },
+        }
+    }
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[Response]) -> Response:
+    """Run the work, cancelling it if the client disconnects before it is done"""
+
+    task = asyncio.ensure_future(work)
+
+    async def watch() -> None:
+        # the body has been read, so the next message is the disconnect
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+        task.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if not watcher.done():
+            raise
+        logger.debug("client went away, abandoned the chat completion")
+        abandoned_requests.labels("false").inc()
+        return Response(status_code=499)  # nobody is left to read it
+    finally:
+        watcher.cancel()
+
+
 @router.post("/completions")
 async def openai_completions(request: CreateCompletionRequest):
     """Completions endpoint"""
@@ -23,17 +77,46 @@ async def openai_completions(request: CreateCompletionRequest):
         return await completions(request)
 
 
-@router.post("/chat/completions")
-async def openai_chat_completions(request: CreateChatCompletionRequest):
-    """Chat Completions endpoint"""
-    if request.stream:
-        return await streaming_chat_completions(request)
+@router.post(
+    "/chat/completions",
+    openapi_extra=body_schema(CreateChatCompletionRequest, "/v1/chat/completions"),
+)
+async def openai_chat_completions(request: Request):
+    """Chat Completions endpoint
+
+    The body is validated against the request model but forwarded as the json it
+    came as. With chat_completions.validate_body off, validation is left to the
+    inference server and only the messages and tools are read.
+    """
+    # the deadline starts when the request comes in
+    budget = RequestBudget(request.headers.get(config.agent_loop.deadline_header))
+
+    raw = await request.body()
+    if wants_passthrough(request, raw):
+        return await passthrough_chat_completions(raw)
+
+    try:
+        body = jsonCodec.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+
+    if config.chat_completions.validate_body:
+        try:
+            CreateChatCompletionRequest.model_validate(body)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False), body=body)
+
+    if not isinstance(body, dict) or not isinstance(body.get("messages"), list):
+        raise HTTPException(status_code=422, detail="Request body needs a list of messages")
+
+    tool_selection = request.headers.get(config.tool_selection.header)
+    if body.get("stream"):
+        return await streaming_chat_completions(body, tool_selection, budget)
     else:
-        return await chat_completions(request)
+        return await cancel_on_disconnect(request, chat_completions(body, tool_selection, budget))
 
 
 @router.get("/models")
 async def models():
     """List models"""
-    response = await client.get("/models")
-    return response.json()
+    return await upstreams.list_models()
@@ -2,6 +2,8 @@ from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 from .types import HealthCheckResponse
 from .manager import manager
+from models.upstreamPoolStatus import UpstreamStatus
+from openai_clients import upstreams
 from openapi_tags import Tag
 
 router = APIRouter(tags=[Tag.health])
@@ -27,3 +29,9 @@ async def health():
         unhealthy_events=[],
     )
     return response
+
+
+@router.get("/health/upstream", response_model=list[UpstreamStatus])
+async def upstream_health():
+    """Health and connection pool usage of the inference servers"""
+    return upstreams.status()
@@ -1,5 +1,6 @@
 from contextlib import asynccontextmanager
 from mcp_clients.McpClientManager import ClientManager
+from openai_clients import upstreams
 from loguru import logger
 
 
@@ -17,5 +18,10 @@ async def lifespan(app):
     logger.log("DEBUG", "Returned form lifespan yield")
 
     # shutdown
+    await ClientManager.shutdown()
+    logger.log("DEBUG", "Stopped MCP clients")
+
+    await upstreams.aclose()
+    logger.log("DEBUG", "Closed inference server clients")
 
     logger.log("DEBUG", "Exiting fastapi lifespan")
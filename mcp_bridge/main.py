@@ -2,8 +2,10 @@ from fastapi import FastAPI
 from endpoints import router as endpointRouter
 from mcpManagement import router as mcpRouter
 from health import router as healthRouter
+from metrics.router import router as metricsRouter
 from mcp_server import router as mcp_server_router
 from lifespan import lifespan
+from tracing import TracingMiddleware
 from openapi_tags import tags_metadata
 from __init__ import __version__ as version
 
@@ -15,9 +17,12 @@ app = FastAPI(
     openapi_tags=tags_metadata,
 )
 
+app.add_middleware(TracingMiddleware)
+
 app.include_router(endpointRouter)
 app.include_router(mcpRouter)
 app.include_router(healthRouter)
+app.include_router(metricsRouter)
 app.include_router(mcp_server_router)
 
 if __name__ == "__main__":
@@ -8,12 +8,12 @@ router = APIRouter(prefix="/prompts")
 
 @router.get("")
 async def get_prompts() -> dict[str, ListPromptsResult]:
-    """Get all prompts from all MCP clients"""
+    """Get all prompts from all MCP clients, servers that did not answer in time have none and say why in _meta"""
 
-    prompts = {}
+    prompts, unavailable = await ClientManager.fan_out(lambda client: client.list_prompts())
 
-    for name, client in ClientManager.get_clients():
-        prompts[name] = await client.list_prompts()
+    for name, reason in unavailable.items():
+        prompts[name] = ListPromptsResult(prompts=[], _meta={"unavailable": reason})
 
     return prompts
 
@@ -22,7 +22,7 @@ async def get_prompts() -> dict[str, ListPromptsResult]:
 async def get_prompt(prompt_name: str, args: dict[str, str] = {}) -> GetPromptResult:
     """Evaluate a prompt"""
 
-    client = await ClientManager.get_client_from_prompt(prompt_name)
+    client = ClientManager.get_client_from_prompt(prompt_name)
     if not client:
         raise HTTPException(status_code=404, detail=f"Prompt '{prompt_name}' not found")
 
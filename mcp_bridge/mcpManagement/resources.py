@@ -7,11 +7,11 @@ router = APIRouter(prefix="/resources")
 
 @router.get("")
 async def get_resources() -> dict[str, ListResourcesResult]:
-    """Get all resources from all MCP clients"""
+    """Get all resources from all MCP clients, servers that did not answer in time have none and say why in _meta"""
 
-    resources = {}
+    resources, unavailable = await ClientManager.fan_out(lambda client: client.list_resources())
 
-    for name, client in ClientManager.get_clients():
-        resources[name] = await client.list_resources()
+    for name, reason in unavailable.items():
+        resources[name] = ListResourcesResult(resources=[], _meta={"unavailable": reason})
 
     return resources
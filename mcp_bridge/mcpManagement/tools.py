@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from mcp_clients.McpClientManager import ClientManager
+from openai_clients.toolResults import tool_result_store
 from mcp.types import ListToolsResult, CallToolResult
 
 router = APIRouter(prefix="/tools")
@@ -7,21 +8,32 @@ router = APIRouter(prefix="/tools")
 
 @router.get("")
 async def get_tools() -> dict[str, ListToolsResult]:
-    """Get all tools from all MCP clients"""
+    """Get all tools from all MCP clients, servers that did not answer in time have none and say why in _meta"""
 
-    tools = {}
+    tools, unavailable = await ClientManager.fan_out(lambda client: client.list_tools())
 
-    for name, client in ClientManager.get_clients():
-        tools[name] = await client.list_tools()
+    for name, reason in unavailable.items():
+        tools[name] = ListToolsResult(tools=[], _meta={"unavailable": reason})
 
     return tools
 
 
+@router.get("/results/{reference}")
+async def get_tool_result(reference: str) -> CallToolResult:
+    """Get the full version of a tool result that was truncated for the model"""
+
+    result = tool_result_store.get(reference)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Tool result '{reference}' not found or expired")
+
+    return result
+
+
 @router.post("/{tool_name}/call")
 async def call_tool(tool_name: str, arguments: dict[str, str] = {}) -> CallToolResult:
     """Call a tool"""
 
-    client = await ClientManager.get_client_from_tool(tool_name)
+    client = ClientManager.get_client_from_tool(tool_name)
     if not client:
         raise HTTPException(status_code=404, detail=f"Tool '{tool_name}' not found")
 
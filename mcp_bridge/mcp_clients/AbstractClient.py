@@ -1,10 +1,18 @@
 import asyncio
+import random
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 from fastapi import HTTPException
 from mcp import ClientSession, McpError
 from mcp.types import (
+    CallToolRequest,
+    CallToolRequestParams,
     CallToolResult,
+    ClientRequest,
+    JSONRPCMessage,
+    JSONRPCNotification,
+    RequestParams,
     ListToolsResult,
     TextContent,
     ListResourcesResult,
@@ -12,10 +20,48 @@ from mcp.types import (
     GetPromptResult,
     TextResourceContents,
     BlobResourceContents,
+    ServerCapabilities,
+    ServerNotification,
+    ToolListChangedNotification,
+    PromptListChangedNotification,
+    ResourceListChangedNotification,
+    ResourceUpdatedNotification,
 )
 from loguru import logger
 from pydantic import AnyUrl
-from models.mcpServerStatus import McpServerStatus
+from config import config
+from config.final import ResourceCache, ToolCache
+from metrics import session_reconnects, tool_call_duration, tool_call_errors, tool_calls_cancelled
+from tracing import current_request_id, start_span
+from models.mcpServerStatus import McpServerStatus, SessionState
+from .McpCatalog import catalog
+from .ToolResultCache import ToolResultCache
+from .ResourceContentCache import ResourceContentCache
+
+
+def cancel_notifier(session: ClientSession) -> Optional[Callable[[str], Awaitable[None]]]:
+    """Return a function that sends notifications/cancelled for the next request of the session
+
+    mcp 1.2 has no public way to learn the id of a request or to send this notification,
+    so this is the one place that reads the session internals. mcp is pinned to the
+    version they were checked against, and when they are missing this returns None and
+    an abandoned call is only cancelled in the bridge.
+    """
+    request_id = getattr(session, "_request_id", None)
+    write_stream = getattr(session, "_write_stream", None)
+    if not isinstance(request_id, int) or write_stream is None:
+        return None
+
+    async def notify_cancelled(reason: str) -> None:
+        # mcp has no type for this notification yet, so it is written as plain json-rpc
+        notification = JSONRPCNotification(
+            jsonrpc="2.0",
+            method="notifications/cancelled",
+            params={"requestId": request_id, "reason": reason},
+        )
+        await write_stream.send(JSONRPCMessage(notification))
+
+    return notify_cancelled
 
 
 class GenericMcpClient(ABC):
@@ -23,11 +69,31 @@ class GenericMcpClient(ABC):
     config: Any
     client: Any
     session: ClientSession | None = None
+    capabilities: ServerCapabilities
+    tool_cache: ToolResultCache | None
+    resource_cache: ResourceContentCache | None
+    pool: Any = None  # the ReplicatedClient this client is a replica of, if any
 
-    def __init__(self, name: str) -> None:
+    def __init__(
+        self, name: str, tool_cache: ToolCache | None = None, resource_cache: ResourceCache | None = None
+    ) -> None:
         super().__init__()
         self.session = None
+        self.capabilities = ServerCapabilities()
         self.name = name
+        self.tool_cache = ToolResultCache(tool_cache) if tool_cache is not None else None
+        self.resource_cache = ResourceContentCache(resource_cache) if resource_cache is not None else None
+        self._subscriptions: set[str] = set()  # resources the current session reports updates of
+        self._failed_subscriptions: set[str] = set()  # resources the current session refused to subscribe
+        self.inflight: int = 0  # tool calls currently running on this session
+        self.last_used: float = time.monotonic()
+        self._maintainer: asyncio.Task | None = None
+        self._cancellations: set[asyncio.Task] = set()
+
+        self.state: SessionState = SessionState.connecting
+        self.failures: int = 0  # connects in a row that failed or ended
+        # replaced on every state change, so waiters wake up as soon as anything happens
+        self._state_changed = asyncio.Event()
 
         logger.debug(f"initializing client class for {name}")
 
@@ -36,38 +102,260 @@ class GenericMcpClient(ABC):
         pass
 
     async def _session_maintainer(self):
+        sessions = config.sessions
+
         while True:
             try:
                 await self._maintain_session()
             except Exception as e:
                 logger.trace(f"failed to maintain session for {self.name}: {e}")
 
-            logger.debug(f"restarting session for {self.name}")
-            await asyncio.sleep(0.5)
+            self._session_closed()
+            self.failures += 1
+            session_reconnects.labels(self.name).inc()
+
+            if self.failures >= sessions.failure_threshold:
+                if self.state != SessionState.open_circuit:
+                    logger.warning(
+                        f"{self.name} failed to connect {self.failures} times, failing calls until it reconnects"
+                    )
+                self._set_state(SessionState.open_circuit)
+
+            # exponential backoff with jitter, so a broken server is not hammered
+            # and several broken servers do not retry in lockstep
+            delay = min(
+                sessions.backoff_max,
+                sessions.backoff_initial * sessions.backoff_multiplier ** (self.failures - 1),
+            )
+            delay *= random.uniform(1 - sessions.backoff_jitter, 1 + sessions.backoff_jitter)
+
+            logger.debug(f"restarting session for {self.name} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def _set_state(self, state: SessionState) -> None:
+        if state != self.state:
+            logger.debug(f"session of {self.name} is {state.value}")
+
+        self.state = state
+        self._state_changed.set()
+        self._state_changed = asyncio.Event()
+
+        if self.pool is not None:
+            self.pool.replica_changed()
 
     async def start(self):
-        asyncio.create_task(self._session_maintainer())
+        self._maintainer = asyncio.create_task(self._session_maintainer())
+
+    async def stop(self):
+        """Stop maintaining the session, this shuts the server down"""
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            try:
+                await self._maintainer
+            except asyncio.CancelledError:
+                pass
+
+        self._session_closed()
+
+    async def _session_ready(
+        self, session: ClientSession, capabilities: ServerCapabilities
+    ) -> None:
+        """Publish an initialized session and load its catalog"""
+        self._reset_resources()
+        self.session = session
+        self.capabilities = capabilities
+        asyncio.create_task(self._receive_notifications(session))
+        await self.refresh_tools()
+        await self.refresh_prompts()
+        await self.refresh_resources()
+
+        if self.failures > 0:
+            logger.info(f"reconnected to {self.name} after {self.failures} failures")
+        self.failures = 0
+
+        # a fresh replica counts as used so the pool does not stop it straight away
+        self.last_used = time.monotonic()
+        self._set_state(SessionState.ready)
+
+    def _session_closed(self) -> None:
+        """Withdraw the session and its catalog"""
+        self.session = None
+        self._reset_resources()
+
+        # replicas share the catalog entry of their pool, which stays while any replica is up
+        if self.pool is None:
+            catalog.remove_server(self.name)
+
+        if self.state == SessionState.ready:
+            self._set_state(SessionState.degraded)
+        elif self.pool is not None:
+            self.pool.replica_changed()
+
+    async def _receive_notifications(self, session: ClientSession) -> None:
+        # the session hands every incoming message to this stream and blocks until
+        # it is consumed, so it has to be drained for the session to make progress
+        async for message in session.incoming_messages:
+            if isinstance(message, Exception):
+                logger.warning(f"received error from {self.name}: {message}")
+                continue
+
+            if not isinstance(message, ServerNotification):
+                logger.debug(f"ignoring request from {self.name}: {message}")
+                continue
+
+            # refresh in the background, awaiting a response here would deadlock the session
+            if isinstance(message.root, ToolListChangedNotification):
+                logger.debug(f"tool list changed for {self.name}")
+                asyncio.create_task(self.refresh_tools())
+
+            elif isinstance(message.root, PromptListChangedNotification):
+                logger.debug(f"prompt list changed for {self.name}")
+                asyncio.create_task(self.refresh_prompts())
+
+            elif isinstance(message.root, ResourceListChangedNotification):
+                logger.debug(f"resource list changed for {self.name}")
+                asyncio.create_task(self.refresh_resources())
+
+            elif isinstance(message.root, ResourceUpdatedNotification):
+                # replicas read resources for their pool, which holds the cache
+                cache = (self.pool or self).resource_cache
+                if cache is not None:
+                    cache.invalidate(str(message.root.params.uri))
+
+        logger.debug(f"notification stream closed for {self.name}")
+
+    async def refresh_tools(self) -> None:
+        """Reload the tools of this server into the catalog"""
+        session = self.session
+        if session is None or self.capabilities.tools is None:
+            return
+
+        try:
+            result = await session.list_tools()
+        except Exception as e:
+            logger.error(f"error refreshing tools for {self.name}: {e}")
+            return
+
+        # the session may have been replaced while we were waiting
+        if self.session is session:
+            catalog.set_tools(self.name, result.tools)
+
+    async def refresh_prompts(self) -> None:
+        """Reload the prompts of this server into the catalog"""
+        session = self.session
+        if session is None or self.capabilities.prompts is None:
+            return
+
+        try:
+            result = await session.list_prompts()
+        except Exception as e:
+            logger.error(f"error refreshing prompts for {self.name}: {e}")
+            return
+
+        if self.session is session:
+            catalog.set_prompts(self.name, result.prompts)
+
+    async def refresh_resources(self) -> None:
+        """Reload the resources of this server into the catalog"""
+        session = self.session
+        if session is None or self.capabilities.resources is None:
+            return
+
+        try:
+            result = await session.list_resources()
+        except Exception as e:
+            logger.error(f"error refreshing resources for {self.name}: {e}")
+            return
+
+        if self.session is session:
+            catalog.set_resources(self.name, result.resources)
+
+    def _reset_resources(self) -> None:
+        """Forget cached contents and subscriptions, they belong to the session that is going away"""
+        self._subscriptions = set()
+        self._failed_subscriptions = set()
+        if self.resource_cache is not None:
+            self.resource_cache.clear()
 
     async def call_tool(
-        self, name: str, arguments: dict, timeout: Optional[int] = None
+        self, name: str, arguments: dict, timeout: Optional[float] = None
     ) -> CallToolResult:
-        await self._wait_for_session()
+        span = start_span("tool", tool=name, server=self.name)
+        failed = True
+        try:
+            result = await self._cached_call_tool(name, arguments, timeout)
+            failed = result.isError
+            return result
+        except asyncio.CancelledError:
+            # the request that made the call went away, that is not the tool's fault
+            failed = False
+            tool_calls_cancelled.labels(self.name, name).inc()
+            raise
+        finally:
+            span.end("tool call failed" if failed else None)
+            tool_call_duration.labels(self.name, name).observe(span.duration)  # type: ignore
+            if failed:
+                tool_call_errors.labels(self.name, name).inc()
+
+    async def _cached_call_tool(
+        self, name: str, arguments: dict, timeout: Optional[float] = None
+    ) -> CallToolResult:
+        cache = self.tool_cache if self.tool_cache is not None and self.tool_cache.caches(name) else None
+        if cache is not None:
+            cached = cache.get(name, arguments)
+            if cached is not None:
+                logger.debug("using cached result for {}", name)
+                return cached
+
+        result = await self._call_tool(name, arguments, timeout)
+
+        if cache is not None:
+            cache.put(name, arguments, result)
 
+        return result
+
+    async def _call_tool(
+        self, name: str, arguments: dict, timeout: Optional[float] = None
+    ) -> CallToolResult:
+        deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
         try:
-            async with asyncio.timeout(timeout):
-                return await self.session.call_tool(
-                    name=name,
-                    arguments=arguments,
+            # the timeout also covers waiting for a session that is reconnecting
+            async with asyncio.timeout_at(deadline):
+                await self._wait_for_session()
+        except asyncio.TimeoutError:
+            logger.error(f"timed out waiting for {self.name} to call tool: {name}")
+            return self._timeout_result(name)
+
+        session = self.session
+        # taken right before send_request, which gives the call the next request id
+        notify_cancelled = cancel_notifier(session)
+
+        self.inflight += 1
+        try:
+            # the request id lets a server correlate the call with the bridge request
+            request_id = current_request_id()
+            meta = RequestParams.Meta(requestId=request_id) if request_id is not None else None
+
+            async with asyncio.timeout_at(deadline):
+                return await session.send_request(
+                    ClientRequest(
+                        CallToolRequest(
+                            method="tools/call",
+                            params=CallToolRequestParams(name=name, arguments=arguments, _meta=meta),
+                        )
+                    ),
+                    CallToolResult,
                 )
 
         except asyncio.TimeoutError:
             logger.error(f"timed out calling tool: {name}")
-            return CallToolResult(
-                content=[
-                    TextContent(type="text", text=f"Timeout Error calling {name}")
-                ],
-                isError=True,
-            )
+            self._cancel_request(notify_cancelled, "timed out")
+            return self._timeout_result(name)
+
+        except asyncio.CancelledError:
+            logger.debug("cancelling call to {} on {}", name, self.name)
+            self._cancel_request(notify_cancelled, "the request was abandoned")
+            raise
 
         except McpError as e:
             logger.error(f"error calling {name}: {e}")
@@ -76,6 +364,37 @@ class GenericMcpClient(ABC):
                 isError=True,
             )
 
+        finally:
+            self.inflight -= 1
+            self.last_used = time.monotonic()
+
+    @staticmethod
+    def _timeout_result(name: str) -> CallToolResult:
+        return CallToolResult(
+            content=[TextContent(type="text", text=f"Timeout Error calling {name}")],
+            isError=True,
+        )
+
+    def _cancel_request(
+        self, notify_cancelled: Optional[Callable[[str], Awaitable[None]]], reason: str
+    ) -> None:
+        """Tell the server to stop working on a request the bridge no longer waits for"""
+        if notify_cancelled is None or not self.config.cancel_notifications:
+            return
+
+        # sent from a task of its own, the caller may be in the middle of being cancelled
+        task = asyncio.create_task(self._send_cancelled(notify_cancelled, reason))
+        self._cancellations.add(task)
+        task.add_done_callback(self._cancellations.discard)
+
+    async def _send_cancelled(
+        self, notify_cancelled: Callable[[str], Awaitable[None]], reason: str
+    ) -> None:
+        try:
+            await notify_cancelled(reason)
+        except Exception as e:
+            logger.debug("could not cancel a request on {}: {}", self.name, e)
+
     async def get_prompt(
         self, prompt: str, arguments: dict[str, str]
     ) -> GetPromptResult | None:
@@ -91,14 +410,50 @@ class GenericMcpClient(ABC):
     async def read_resource(
         self, uri: AnyUrl
     ) -> list[TextResourceContents | BlobResourceContents]:
+        cache = self.resource_cache
+        if cache is not None:
+            cached = cache.get(str(uri))
+            if cached is not None:
+                logger.debug("using cached contents of {}", uri)
+                return cached
+            version = cache.version
+
         await self._wait_for_session()
+
+        session = self.session
         try:
-            resource = await self.session.read_resource(uri)
-            return resource.contents
+            if cache is not None:
+                # subscribe before reading, so an update made during the read is not missed
+                await self._subscribe(session, uri)
+            resource = await session.read_resource(uri)
         except Exception as e:
             logger.error(f"error reading resource: {e}")
             return []
 
+        if cache is not None and self.session is session:
+            cache.put(str(uri), resource.contents, version)
+        return resource.contents
+
+    async def _subscribe(self, session: ClientSession, uri: AnyUrl) -> None:
+        """Ask the server to report updates of a resource, if it supports subscriptions"""
+        resources = self.capabilities.resources
+        if resources is None or not resources.subscribe or not self.resource_cache.config.subscribe:
+            return
+
+        if str(uri) in self._subscriptions or str(uri) in self._failed_subscriptions:
+            return
+
+        try:
+            await session.subscribe_resource(uri)
+        except Exception as e:
+            # the cached contents still expire after their ttl, and a failed
+            # subscription is not retried on every read
+            logger.warning(f"could not subscribe to {uri} on {self.name}: {e}")
+            self._failed_subscriptions.add(str(uri))
+            return
+
+        self._subscriptions.add(str(uri))
+
     async def list_tools(self) -> ListToolsResult:
         # if session is None, then the client is not running
         # wait to see if it restarts
@@ -126,25 +481,45 @@ class GenericMcpClient(ABC):
             logger.error(f"error listing prompts: {e}")
             return ListPromptsResult(prompts=[])
 
-    async def _wait_for_session(self, timeout: int = 5, http_error: bool = True):
+    async def _wait_for_session(
+        self, timeout: Optional[float] = None, http_error: bool = True
+    ):
+        if self.session is not None:
+            return
+
+        timeout = config.sessions.connect_wait if timeout is None else timeout
+
         try:
             async with asyncio.timeout(timeout):
-                while self.session is None:
-                    await asyncio.sleep(1)
-                    logger.debug(f"waiting for session for {self.name}")
+                # an open circuit fails straight away instead of waiting out the timeout
+                while self.session is None and self.state != SessionState.open_circuit:
+                    logger.debug("waiting for session for {}", self.name)
+                    await self._state_changed.wait()
 
         except asyncio.TimeoutError:
+            pass
+
+        if self.session is None:
             if http_error:
                 raise HTTPException(
-                    status_code=500, detail=f"Could not connect to MCP server \"{self.name}\"." 
+                    status_code=503 if self.state == SessionState.open_circuit else 500,
+                    detail=f"Could not connect to MCP server \"{self.name}\".",
                 )
 
             raise TimeoutError(f"Could not connect to MCP server \"{self.name}\"." )
 
-        assert self.session is not None, "Session is None"
-
     async def status(self) -> McpServerStatus:
         """Get the status of the MCP server"""
         return McpServerStatus(
-            name=self.name, online=self.session is not None, enabled=True
+            name=self.name,
+            online=self.session is not None,
+            enabled=True,
+            state=self.state,
+            failures=self.failures,
+            tool_cache=self.tool_cache.status() if self.tool_cache is not None else None,
+            resource_cache=(
+                self.resource_cache.status(len(self._subscriptions))
+                if self.resource_cache is not None
+                else None
+            ),
         )
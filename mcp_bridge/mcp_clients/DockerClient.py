@@ -1,8 +1,9 @@
 import asyncio
 from mcp import ClientSession
-from .transports.docker import docker_client
+from .transports.docker import StandbyContainers, docker_client
 from config import config
 from config.final import DockerMCPServer
+from models.mcpServerStatus import ContainerStatus
 from .AbstractClient import GenericMcpClient
 from loguru import logger
 
@@ -11,18 +12,47 @@ class DockerClient(GenericMcpClient):
     config: DockerMCPServer
     session: ClientSession | None = None
 
-    def __init__(self, name: str, config: DockerMCPServer) -> None:
-        super().__init__(name=name)
+    def __init__(
+        self, name: str, config: DockerMCPServer, standby: StandbyContainers | None = None
+    ) -> None:
+        super().__init__(
+            name=name, tool_cache=config.tool_cache, resource_cache=config.resource_cache
+        )
 
         self.config = config
+        # a pool passes the standby containers it shares between its replicas,
+        # and fills and closes them itself
+        self.owns_standby = standby is None
+        self.standby = standby if standby is not None else StandbyContainers(config)
+        self.container: ContainerStatus | None = None
+
+    async def start(self):
+        if self.owns_standby:
+            self.standby.fill()
+        await super().start()
+
+    async def stop(self):
+        await super().stop()
+        if self.owns_standby:
+            await self.standby.close()
+
+    def _container_started(self, container: ContainerStatus) -> None:
+        self.container = container
+        logger.info(
+            f"attached to {container.source} container {container.id[:12]} for {self.name} "
+            f"(pull {container.pull_seconds:.2f}s, create {container.create_seconds:.2f}s, "
+            f"start {container.start_seconds:.2f}s, attach {container.attach_seconds:.2f}s)"
+        )
 
     async def _maintain_session(self):
-        async with docker_client(self.config) as client:
+        async with docker_client(self.config, self.standby, self._container_started) as client:
             logger.debug(f"made instance of docker client for {self.name}")
             async with ClientSession(*client) as session:
-                await session.initialize()
+                # a server that dies before answering would leave this waiting forever
+                async with asyncio.timeout(config.sessions.initialize_timeout):
+                    init = await session.initialize()
                 logger.debug(f"finished initialise session for {self.name}")
-                self.session = session
+                await self._session_ready(session, init.capabilities)
 
                 try:
                     while True:
@@ -34,6 +64,11 @@ class DockerClient(GenericMcpClient):
 
                 except Exception as exc:
                     logger.error(f"ping failed for {self.name}: {exc}")
-                    self.session = None
+                    self._session_closed()
 
         logger.debug(f"exiting session for {self.name}")
+
+    async def status(self):
+        status = await super().status()
+        status.container = self.container
+        return status
@@ -0,0 +1,98 @@
+from mcp.types import Prompt, Resource, Tool
+from loguru import logger
+
+__all__ = ["catalog"]
+
+
+class McpCatalog:
+    """Caches the tools, prompts and resources advertised by every connected MCP server
+
+    Names, and URIs for resources, are routed to a single owning server. When several
+    servers expose the same name, the server listed first in the config owns it and the
+    others are shadowed.
+    """
+
+    def __init__(self) -> None:
+        self.tools: dict[str, list[Tool]] = {}
+        self.prompts: dict[str, list[Prompt]] = {}
+        self.resources: dict[str, list[Resource]] = {}
+        self.tool_owners: dict[str, str] = {}
+        self.prompt_owners: dict[str, str] = {}
+        self.resource_owners: dict[str, str] = {}  # uri -> server
+        self.server_order: list[str] = []
+        self.version: int = 0  # bumped on every change so consumers can cheaply detect staleness
+
+        self._tools: list[Tool] = []
+        self._shadowed: set[tuple[str, str, str]] = set()
+
+    def set_server_order(self, servers: list[str]) -> None:
+        self.server_order = list(servers)
+        self._rebuild()
+
+    def set_tools(self, server: str, tools: list[Tool]) -> None:
+        self.tools[server] = tools
+        self._rebuild()
+        logger.debug(f"tool catalog updated for {server}: {len(tools)} tools")
+
+    def set_prompts(self, server: str, prompts: list[Prompt]) -> None:
+        self.prompts[server] = prompts
+        self._rebuild()
+        logger.debug(f"prompt catalog updated for {server}: {len(prompts)} prompts")
+
+    def set_resources(self, server: str, resources: list[Resource]) -> None:
+        self.resources[server] = resources
+        self._rebuild()
+        logger.debug(f"resource catalog updated for {server}: {len(resources)} resources")
+
+    def remove_server(self, server: str) -> None:
+        tools = self.tools.pop(server, None)
+        prompts = self.prompts.pop(server, None)
+        resources = self.resources.pop(server, None)
+        if tools is not None or prompts is not None or resources is not None:
+            self._rebuild()
+            logger.debug(f"removed {server} from the catalog")
+
+    def get_tools(self) -> list[Tool]:
+        """All routable tools, shadowed duplicates are left out"""
+        return self._tools
+
+    def _ordered(self, entries: dict) -> list[str]:
+        """Servers in config order, followed by any the config does not know about"""
+        known = [server for server in self.server_order if server in entries]
+        return known + sorted(server for server in entries if server not in self.server_order)
+
+    def _index(
+        self, entries: dict, kind: str, shadowed: set[tuple[str, str, str]]
+    ) -> dict[str, str]:
+        owners: dict[str, str] = {}
+        for server in self._ordered(entries):
+            for entry in entries[server]:
+                key = str(entry.uri) if kind == "resource" else entry.name
+                owner = owners.setdefault(key, server)
+                if owner == server:
+                    continue
+
+                shadowed.add((kind, key, server))
+                # only warn once instead of on every rebuild
+                if (kind, key, server) not in self._shadowed:
+                    logger.warning(
+                        f'{kind} "{key}" from {server} is shadowed by {owner}'
+                    )
+        return owners
+
+    def _rebuild(self) -> None:
+        shadowed: set[tuple[str, str, str]] = set()
+        self.tool_owners = self._index(self.tools, "tool", shadowed)
+        self.prompt_owners = self._index(self.prompts, "prompt", shadowed)
+        self.resource_owners = self._index(self.resources, "resource", shadowed)
+        self._shadowed = shadowed
+        self._tools = [
+            tool
+            for server in self._ordered(self.tools)
+            for tool in self.tools[server]
+            if self.tool_owners[tool.name] == server
+        ]
+        self.version += 1
+
+
+catalog: McpCatalog = McpCatalog()
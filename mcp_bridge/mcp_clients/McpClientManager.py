@@ -1,24 +1,36 @@
-from typing import Union
+import asyncio
+import time
+from typing import Awaitable, Callable, Literal, Optional, TypeVar, Union
 from config import config
-from mcp import McpError, StdioServerParameters
+from mcp import Tool
 from loguru import logger
 
 from .StdioClient import StdioClient
 from .SseClient import SseClient
 from .DockerClient import DockerClient
-from config.final import DockerMCPServer, SSEMCPServer
+from .ReplicatedClient import ReplicatedClient
+from .transports.docker import StandbyContainers
+from .McpCatalog import catalog
+from config.final import DockerMCPServer, SSEMCPServer, StdioMCPServer
 
-client_types = Union[StdioClient, SseClient, DockerClient]
+client_types = Union[StdioClient, SseClient, DockerClient, ReplicatedClient]
+
+T = TypeVar("T")
+Unavailable = Literal["offline", "timeout", "error"]
 
 
 class MCPClientManager:
     clients: dict[str, client_types] = {}
+    last_relist: float = float("-inf")  # monotonic time the resources were last listed for an unknown uri
 
     async def initialize(self):
         """Initialize the MCP Client Manager and start all clients"""
 
         logger.log("DEBUG", "Initializing MCP Client Manager")
 
+        # the config order decides which server owns a name shared by several servers
+        catalog.set_server_order(list(config.mcp_servers.keys()))
+
         for server_name, server_config in config.mcp_servers.items():
             self.clients[server_name] = await self.construct_client(
                 server_name, server_config
@@ -27,8 +39,13 @@ class MCPClientManager:
     async def construct_client(self, name, server_config) -> client_types:
         logger.log("DEBUG", f"Constructing client for {server_config}")
 
-        if isinstance(server_config, StdioServerParameters):
-            client = StdioClient(name, server_config)
+        if isinstance(server_config, StdioMCPServer):
+            if server_config.max_replicas > 1:
+                client = ReplicatedClient(
+                    name, server_config, lambda: StdioClient(name, server_config)
+                )
+            else:
+                client = StdioClient(name, server_config)
             await client.start()
             return client
 
@@ -39,47 +56,113 @@ class MCPClientManager:
             return client
         
         if isinstance(server_config, DockerMCPServer):
-            client = DockerClient(name, server_config)
+            if server_config.max_replicas > 1:
+                standby = StandbyContainers(server_config)
+                client = ReplicatedClient(
+                    name,
+                    server_config,
+                    lambda: DockerClient(name, server_config, standby),
+                    standby,
+                )
+            else:
+                client = DockerClient(name, server_config)
             await client.start()
             return client
 
         raise NotImplementedError("Client Type not supported")
 
+    async def shutdown(self):
+        """Stop all clients, this shuts down the servers and their containers"""
+        for client in self.clients.values():
+            await client.stop()
+
     def get_client(self, server_name: str):
         return self.clients[server_name]
 
     def get_clients(self):
         return list(self.clients.items())
 
-    async def get_client_from_tool(self, tool: str):
-        for name, client in self.get_clients():
-            
-            # client cannot have tools if it is not connected
-            if not client.session:
-                continue
-
-            try:
-                list_tools = await client.session.list_tools()
-                for client_tool in list_tools.tools:
-                    if client_tool.name == tool:
-                        return client
-            except McpError:
-                continue
-
-    async def get_client_from_prompt(self, prompt: str):
-        for name, client in self.get_clients():
-
-            # client cannot have prompts if it is not connected
-            if not client.session:
-                continue
-
-            try:
-                list_prompts = await client.session.list_prompts()
-                for client_prompt in list_prompts.prompts:
-                    if client_prompt.name == prompt:
-                        return client
-            except McpError:
-                continue
+    async def fan_out(
+        self, call: Callable[[client_types], Awaitable[T]], timeout: Optional[float] = None
+    ) -> tuple[dict[str, T], dict[str, Unavailable]]:
+        """Make a call on every client at once, each gets at most timeout seconds to answer
+
+        Returns the results of the servers that answered, and for the others
+        whether they were offline, timed out or failed.
+        """
+        timeout = config.sessions.list_timeout if timeout is None else timeout
+
+        async def bounded(client: client_types) -> T:
+            async with asyncio.timeout(timeout):
+                return await call(client)
+
+        clients = self.get_clients()
+        outcomes = await asyncio.gather(
+            *(bounded(client) for _, client in clients), return_exceptions=True
+        )
+
+        results: dict[str, T] = {}
+        unavailable: dict[str, Unavailable] = {}
+        for (name, client), outcome in zip(clients, outcomes):
+            if not isinstance(outcome, BaseException):
+                results[name] = outcome
+            elif client.session is None:
+                unavailable[name] = "offline"
+            elif isinstance(outcome, TimeoutError):
+                unavailable[name] = "timeout"
+            else:
+                logger.error(f"error calling {name}: {outcome!r}")
+                unavailable[name] = "error"
+
+        if unavailable:
+            logger.warning(f"servers left out of the listing: {unavailable}")
+        return results, unavailable
+
+    def get_tools(self) -> list[Tool]:
+        """Get the cached tools of all connected clients without contacting them"""
+        return catalog.get_tools()
+
+    def get_client_from_tool(self, tool: str) -> client_types | None:
+        """Get the client that owns a tool, this is a lookup in the catalog index"""
+        owner = catalog.tool_owners.get(tool)
+        if owner is None:
+            return None
+
+        return self.clients.get(owner)
+
+    def get_client_from_prompt(self, prompt: str) -> client_types | None:
+        """Get the client that owns a prompt, this is a lookup in the catalog index"""
+        owner = catalog.prompt_owners.get(prompt)
+        if owner is None:
+            return None
+
+        return self.clients.get(owner)
+
+    def get_client_from_resource(self, uri: str) -> client_types | None:
+        """Get the client that owns a resource URI, this is a lookup in the catalog index"""
+        owner = catalog.resource_owners.get(uri)
+        if owner is None:
+            return None
+
+        return self.clients.get(owner)
+
+    async def find_client_for_resource(self, uri: str) -> client_types | None:
+        """Get the client that owns a resource URI, listing the resources again if it is unknown
+
+        The catalog may be behind servers that do not announce list changes. The servers
+        are listed at most once per relist_interval, so unknown URIs cannot keep them busy.
+        """
+        client = self.get_client_from_resource(uri)
+        if client is not None:
+            return client
+
+        now = time.monotonic()
+        if now - self.last_relist < config.sessions.relist_interval:
+            return None
+
+        self.last_relist = now
+        await self.fan_out(lambda client: client.refresh_resources())
+        return self.get_client_from_resource(uri)
 
 
 ClientManager = MCPClientManager()
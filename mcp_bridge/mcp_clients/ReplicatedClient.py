@@ -0,0 +1,157 @@
+import asyncio
+import contextlib
+import time
+from typing import Callable, Optional
+from mcp.types import CallToolResult
+from loguru import logger
+from config.final import DockerMCPServer, StdioMCPServer
+from models.mcpServerStatus import SessionState
+from .AbstractClient import GenericMcpClient
+from .transports.docker import StandbyContainers
+from .McpCatalog import catalog
+
+
+class ReplicatedClient(GenericMcpClient):
+    """Runs several instances of a stdio or docker server and spreads tool calls over them
+
+    Prompts, resources and listings go to any ready replica. Tool calls go to the
+    replica with the fewest calls in flight, and when every replica is busy the pool
+    starts another one, up to max_replicas. Extra replicas that stay idle are stopped.
+    """
+
+    config: StdioMCPServer | DockerMCPServer
+
+    def __init__(
+        self,
+        name: str,
+        config: StdioMCPServer | DockerMCPServer,
+        replica_factory: Callable[[], GenericMcpClient],
+        standby: Optional[StandbyContainers] = None,
+    ) -> None:
+        super().__init__(
+            name=name, tool_cache=config.tool_cache, resource_cache=config.resource_cache
+        )
+
+        self.config = config
+        self.replica_factory = replica_factory
+        self.replicas: list[GenericMcpClient] = []
+        # docker replicas share one set of standby containers, so the configured
+        # count is not multiplied by the number of replicas
+        self.standby = standby
+        self._retiring: set[asyncio.Task] = set()  # idle replicas being stopped by the scale down
+
+    async def _maintain_session(self):
+        """Does nothing, the pool has no session of its own
+
+        start is overridden and never runs the session maintainer, each replica
+        maintains its own session and reports its state to the pool.
+        """
+
+    async def start(self):
+        if self.standby is not None:
+            self.standby.fill()
+
+        for _ in range(self.config.min_replicas):
+            await self._add_replica()
+
+        if self.config.max_replicas > self.config.min_replicas:
+            self._maintainer = asyncio.create_task(self._scale_down())
+
+    async def stop(self):
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._maintainer
+
+        # a replica the scale down was stopping is finished, not stopped a second time
+        await asyncio.gather(*self._retiring, return_exceptions=True)
+
+        for replica in list(self.replicas):
+            await replica.stop()
+
+        self.replicas = []
+        self._session_closed()
+
+        if self.standby is not None:
+            await self.standby.close()
+
+    async def _add_replica(self) -> None:
+        replica = self.replica_factory()
+        replica.pool = self
+        replica.tool_cache = None  # results are cached once, by the pool
+        replica.resource_cache = None
+        self.replicas.append(replica)
+        logger.debug(f"starting replica {len(self.replicas)} of {self.name}")
+        await replica.start()
+
+    async def _scale_down(self) -> None:
+        while True:
+            await asyncio.sleep(min(10, self.config.replica_idle_seconds))
+
+            now = time.monotonic()
+            for replica in list(self.replicas):
+                if len(self.replicas) <= self.config.min_replicas:
+                    break
+
+                # replicas that are still starting up have not had a chance to be used yet
+                if replica.session is None:
+                    continue
+
+                if replica.inflight == 0 and now - replica.last_used > self.config.replica_idle_seconds:
+                    logger.debug(f"stopping idle replica of {self.name}")
+                    self.replicas.remove(replica)
+                    # shielded, so stopping the pool waits for it instead of interrupting it
+                    retiring = asyncio.create_task(replica.stop())
+                    self._retiring.add(retiring)
+                    retiring.add_done_callback(self._retiring.discard)
+                    await asyncio.shield(retiring)
+
+    def replica_changed(self) -> None:
+        """Called by replicas when their session comes up or goes away"""
+        ready = [replica for replica in self.replicas if replica.session is not None]
+        if not ready:
+            self.session = None
+            self._reset_resources()
+            catalog.remove_server(self.name)
+
+            states = {replica.state for replica in self.replicas}
+            if states == {SessionState.open_circuit}:
+                self._set_state(SessionState.open_circuit)
+            elif self.state in (SessionState.ready, SessionState.open_circuit):
+                self._set_state(SessionState.degraded)
+            return
+
+        if self.session not in [replica.session for replica in ready]:
+            # resources are read through the new session, which has none of the old subscriptions
+            self._reset_resources()
+            self.session = ready[0].session
+            self.capabilities = ready[0].capabilities
+
+        self._set_state(SessionState.ready)
+
+    async def _call_tool(
+        self, name: str, arguments: dict, timeout: Optional[float] = None
+    ) -> CallToolResult:
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        try:
+            async with asyncio.timeout_at(deadline):
+                await self._wait_for_session()
+        except asyncio.TimeoutError:
+            logger.error(f"timed out waiting for {self.name} to call tool: {name}")
+            return self._timeout_result(name)
+
+        ready = [replica for replica in self.replicas if replica.session is not None]
+        replica = min(ready, key=lambda replica: replica.inflight)
+
+        # every replica is busy, so the calls after this one would queue up
+        if replica.inflight > 0 and len(self.replicas) < self.config.max_replicas:
+            await self._add_replica()
+
+        remaining = None if deadline is None else max(0.0, deadline - loop.time())
+        return await replica._call_tool(name, arguments, remaining)
+
+    async def status(self):
+        status = await super().status()
+        status.replicas = len(self.replicas)
+        return status
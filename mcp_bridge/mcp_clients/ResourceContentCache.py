@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from mcp.types import BlobResourceContents, TextResourceContents
+from loguru import logger
+from config.final import ResourceCache
+from models.mcpServerStatus import ResourceCacheStatus
+
+Contents = list[TextResourceContents | BlobResourceContents]
+
+
+class ResourceContentCache:
+    """LRU cache of resource contents by URI, bounded by entry count and total size
+
+    Entries expire after the ttl. Servers that support subscriptions also drop them
+    early through invalidate when they report an update.
+    """
+
+    def __init__(self, config: ResourceCache) -> None:
+        self.config = config
+        # uri -> (expiry, size, contents), oldest first
+        self.entries: OrderedDict[str, tuple[float, int, Contents]] = OrderedDict()
+        self.bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        # bumped by every invalidation, a read that overlapped one is not cached
+        self.version: int = 0
+
+    def get(self, uri: str) -> Contents | None:
+        entry = self.entries.get(uri)
+
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(uri)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(uri)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, uri: str, contents: Contents, version: int) -> None:
+        """Cache the contents of a read that started when the cache was at version"""
+        if version != self.version:
+            logger.debug(f"not caching {uri}, it may have been updated while it was read")
+            return
+
+        size = sum(len(item.text if isinstance(item, TextResourceContents) else item.blob) for item in contents)
+        if size > self.config.max_bytes:
+            logger.debug(f"not caching {uri}, {size} bytes is over the cache size")
+            return
+
+        if uri in self.entries:
+            self._remove(uri)
+
+        self.entries[uri] = (time.monotonic() + self.config.ttl, size, contents)
+        self.bytes += size
+
+        while len(self.entries) > self.config.max_entries or self.bytes > self.config.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    def invalidate(self, uri: str) -> None:
+        self.version += 1
+        if uri in self.entries:
+            logger.debug(f"dropping cached contents of {uri}")
+            self._remove(uri)
+
+    def clear(self) -> None:
+        self.version += 1
+        self.entries.clear()
+        self.bytes = 0
+
+    def _remove(self, uri: str) -> None:
+        _, size, _ = self.entries.pop(uri)
+        self.bytes -= size
+
+    def status(self, subscriptions: int) -> ResourceCacheStatus:
+        return ResourceCacheStatus(
+            entries=len(self.entries),
+            bytes=self.bytes,
+            hits=self.hits,
+            misses=self.misses,
+            subscriptions=subscriptions,
+        )
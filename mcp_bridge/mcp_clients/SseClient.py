@@ -11,16 +11,20 @@ class SseClient(GenericMcpClient):
     config: SSEMCPServer
 
     def __init__(self, name: str, config: SSEMCPServer) -> None:
-        super().__init__(name=name)
+        super().__init__(
+            name=name, tool_cache=config.tool_cache, resource_cache=config.resource_cache
+        )
 
         self.config = config
 
     async def _maintain_session(self):
         async with sse_client(self.config.url) as client:
             async with ClientSession(*client) as session:
-                await session.initialize()
+                # a server that dies before answering would leave this waiting forever
+                async with asyncio.timeout(config.sessions.initialize_timeout):
+                    init = await session.initialize()
                 logger.debug(f"finished initialise session for {self.name}")
-                self.session = session
+                await self._session_ready(session, init.capabilities)
 
                 try:
                     while True:
@@ -32,6 +36,6 @@ class SseClient(GenericMcpClient):
 
                 except Exception as exc:
                     logger.error(f"ping failed for {self.name}: {exc}")
-                    self.session = None
+                    self._session_closed()
 
         logger.debug(f"exiting session for {self.name}")
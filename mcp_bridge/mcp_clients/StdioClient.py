@@ -1,7 +1,8 @@
 import asyncio
-from mcp import ClientSession, StdioServerParameters, stdio_client
+from mcp import ClientSession, stdio_client
 
 from config import config
+from config.final import StdioMCPServer
 from .AbstractClient import GenericMcpClient
 from loguru import logger
 import shutil
@@ -12,10 +13,12 @@ import os
 venv_keywords = ["CONDA", "VIRTUAL", "PYTHON"]
 
 class StdioClient(GenericMcpClient):
-    config: StdioServerParameters
+    config: StdioMCPServer
 
-    def __init__(self, name: str, config: StdioServerParameters) -> None:
-        super().__init__(name=name)
+    def __init__(self, name: str, config: StdioMCPServer) -> None:
+        super().__init__(
+            name=name, tool_cache=config.tool_cache, resource_cache=config.resource_cache
+        )
 
         env = dict(os.environ.copy())
 
@@ -50,9 +53,11 @@ class StdioClient(GenericMcpClient):
             assert client[1] is not None, f"missing write stream for {self.name}"
             async with ClientSession(*client) as session:
                 logger.debug(f"entered client session context manager for {self.name}")
-                await session.initialize()
+                # a server that dies before answering would leave this waiting forever
+                async with asyncio.timeout(config.sessions.initialize_timeout):
+                    init = await session.initialize()
                 logger.debug(f"finished initialise session for {self.name}")
-                self.session = session
+                await self._session_ready(session, init.capabilities)
 
                 try:
                     while True:
@@ -64,6 +69,6 @@ class StdioClient(GenericMcpClient):
 
                 except Exception as exc:
                     logger.error(f"ping failed for {self.name}: {exc}")
-                    self.session = None
+                    self._session_closed()
 
         logger.debug(f"exiting session for {self.name}")
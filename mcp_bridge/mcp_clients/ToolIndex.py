@@ -0,0 +1,113 @@
+import heapq
+import math
+import re
+from collections import Counter
+from mcp.types import Tool
+from loguru import logger
+from .McpCatalog import McpCatalog, catalog
+
+__all__ = ["tool_index"]
+
+# BM25 parameters, the usual defaults
+K1 = 1.2
+B = 0.75
+
+WORD = re.compile(r"[A-Za-z][a-z]*|[0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase words of a text, snake_case and camelCase names are split into words"""
+    return [word.lower() for word in WORD.findall(text)]
+
+
+def tool_text(tool: Tool) -> str:
+    parts = [tool.name, tool.description or ""]
+    properties = tool.inputSchema.get("properties")
+    if isinstance(properties, dict):
+        for name, schema in properties.items():
+            parts.append(name)
+            if isinstance(schema, dict) and isinstance(schema.get("description"), str):
+                parts.append(schema["description"])
+    return " ".join(parts)
+
+
+class ToolIndex:
+    """BM25 index over the names, descriptions and parameters of the catalog's tools
+
+    The index follows the catalog lazily: when its version changes, only the tools
+    that were added, removed or redefined are re-indexed.
+    """
+
+    def __init__(self, catalog: McpCatalog) -> None:
+        self.catalog = catalog
+        self.version: int = -1
+
+        self.tools: dict[str, Tool] = {}
+        self.lengths: dict[str, int] = {}
+        self.postings: dict[str, dict[str, int]] = {}  # term -> tool name -> term frequency
+        self.total_length: int = 0
+
+    def _add(self, tool: Tool) -> None:
+        terms = Counter(tokenize(tool_text(tool)))
+        self.tools[tool.name] = tool
+        self.lengths[tool.name] = sum(terms.values())
+        self.total_length += self.lengths[tool.name]
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[tool.name] = count
+
+    def _remove(self, name: str) -> None:
+        tool = self.tools.pop(name)
+        self.total_length -= self.lengths.pop(name)
+        for term in set(tokenize(tool_text(tool))):
+            postings = self.postings[term]
+            del postings[name]
+            if not postings:
+                del self.postings[term]
+
+    def sync(self) -> None:
+        """Bring the index up to date with the catalog"""
+        if self.version == self.catalog.version:
+            return
+
+        current = {tool.name: tool for tool in self.catalog.get_tools()}
+        changed = 0
+        for name in list(self.tools):
+            tool = current.get(name)
+            if tool is None or (tool is not self.tools[name] and tool != self.tools[name]):
+                self._remove(name)
+                changed += 1
+
+        for name, tool in current.items():
+            if name not in self.tools:
+                self._add(tool)
+                changed += 1
+            else:
+                self.tools[name] = tool  # same definition, keep the newest object
+
+        self.version = self.catalog.version
+        logger.debug(f"tool index updated, {changed} tools re-indexed")
+
+    def search(self, query: str, k: int) -> list[str]:
+        """Names of the k tools that best match the query, best first"""
+        self.sync()
+
+        count = len(self.tools)
+        if count == 0:
+            return []
+
+        average_length = self.total_length / count
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for name, frequency in postings.items():
+                norm = K1 * (1 - B + B * self.lengths[name] / average_length)
+                scores[name] = scores.get(name, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+
+        return heapq.nlargest(k, scores, key=scores.__getitem__)
+
+
+tool_index: ToolIndex = ToolIndex(catalog)
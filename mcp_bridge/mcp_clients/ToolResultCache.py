@@ -0,0 +1,72 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+from mcp.types import CallToolResult
+from loguru import logger
+from config.final import ToolCache
+from models.mcpServerStatus import ToolCacheStatus
+
+
+class ToolResultCache:
+    """LRU cache of tool call results, bounded by entry count and total size"""
+
+    def __init__(self, config: ToolCache) -> None:
+        self.config = config
+        # key -> (expiry, size, result), oldest first
+        self.entries: OrderedDict[str, tuple[float, int, CallToolResult]] = OrderedDict()
+        self.bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def caches(self, tool: str) -> bool:
+        return self.config.tools is None or tool in self.config.tools
+
+    @staticmethod
+    def key(tool: str, arguments: dict[str, Any]) -> str:
+        # canonical json so that argument order and whitespace do not matter
+        return tool + "\0" + json.dumps(arguments, sort_keys=True, separators=(",", ":"))
+
+    def get(self, tool: str, arguments: dict[str, Any]) -> CallToolResult | None:
+        key = self.key(tool, arguments)
+        entry = self.entries.get(key)
+
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, tool: str, arguments: dict[str, Any], result: CallToolResult) -> None:
+        # errors are often transient, so they are never cached
+        if result.isError:
+            return
+
+        size = len(result.model_dump_json())
+        if size > self.config.max_bytes:
+            logger.debug(f"not caching result of {tool}, {size} bytes is over the cache size")
+            return
+
+        key = self.key(tool, arguments)
+        if key in self.entries:
+            self._remove(key)
+
+        ttl = self.config.tool_ttl.get(tool, self.config.ttl)
+        self.entries[key] = (time.monotonic() + ttl, size, result)
+        self.bytes += size
+
+        while len(self.entries) > self.config.max_entries or self.bytes > self.config.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def status(self) -> ToolCacheStatus:
+        return ToolCacheStatus(
+            entries=len(self.entries), bytes=self.bytes, hits=self.hits, misses=self.misses
+        )
@@ -1,18 +1,214 @@
-from aiodocker import Docker
+import asyncio
+import time
+from typing import Callable, Optional
+from aiodocker import Docker, DockerError
+from aiodocker.containers import DockerContainer
 from contextlib import asynccontextmanager
 import anyio
 import anyio.lowlevel
 from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 from loguru import logger
 from config.final import DockerMCPServer
+from models.mcpServerStatus import ContainerStatus
 from mcp import types
 
 
+class LineFramer:
+    """Splits the output of a container into newline delimited messages
+
+    Lines are cut on bytes and parsed whole, so a multibyte character split across
+    chunks stays intact, and every byte is scanned once however long a line gets.
+    """
+
+    def __init__(self, max_message_bytes: int) -> None:
+        self.max_message_bytes = max_message_bytes
+        self.buffer = bytearray()
+        self.scanned = 0  # the start of the buffer that is known to hold no newline
+        self.discarding = False  # skipping the rest of an oversized message
+
+    def feed(self, data: bytes) -> list[bytes | Exception]:
+        """Add a chunk and return the messages it completes"""
+        self.buffer += data
+        messages: list[bytes | Exception] = []
+
+        while (end := self.buffer.find(b"\n", self.scanned)) != -1:
+            line = bytes(self.buffer[:end])
+            del self.buffer[: end + 1]
+            self.scanned = 0
+
+            if self.discarding:
+                self.discarding = False
+            elif len(line) > self.max_message_bytes:
+                messages.append(self._too_large())
+            elif line.strip():
+                messages.append(line)
+
+        self.scanned = len(self.buffer)
+
+        if len(self.buffer) > self.max_message_bytes:
+            if not self.discarding:
+                messages.append(self._too_large())
+                self.discarding = True
+
+            self.buffer.clear()
+            self.scanned = 0
+
+        return messages
+
+    def _too_large(self) -> Exception:
+        return ValueError(f"message exceeds the maximum size of {self.max_message_bytes} bytes")
+
+
+async def ensure_image(docker: Docker, server: DockerMCPServer) -> float:
+    """Pull the image as the pull policy asks, returns the time it took"""
+    started = time.perf_counter()
+
+    if server.pull_policy == "always":
+        await docker.images.pull(server.image)
+
+    elif server.pull_policy == "if-not-present":
+        try:
+            await docker.images.inspect(server.image)
+        except DockerError as e:
+            if e.status != 404:
+                raise
+            logger.info(f"pulling image {server.image}")
+            await docker.images.pull(server.image)
+
+    return time.perf_counter() - started
+
+
+async def create_container(
+    docker: Docker, server: DockerMCPServer
+) -> tuple[DockerContainer, ContainerStatus]:
+    """Create and start a container for the server"""
+    pull_seconds = await ensure_image(docker, server)
+
+    container_config = {
+        "Image": server.image,
+        "Env": [f"{key}={value}" for key, value in server.env.items()],
+        "OpenStdin": True,
+        "AttachStdout": True,
+        "AttachStderr": True,
+        "Tty": False,
+        # named containers are kept so the next connect can reuse them
+        "HostConfig": {"AutoRemove": server.container_name is None},
+    }
+    if server.args:
+        container_config["Cmd"] = server.args
+
+    started = time.perf_counter()
+    container = await docker.containers.create(container_config, name=server.container_name)
+    create_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await container.start()
+    start_seconds = time.perf_counter() - started
+
+    return container, ContainerStatus(
+        id=container.id,
+        source="created",
+        pull_seconds=pull_seconds,
+        create_seconds=create_seconds,
+        start_seconds=start_seconds,
+    )
+
+
+async def existing_container(
+    docker: Docker, name: str
+) -> tuple[DockerContainer, ContainerStatus] | None:
+    """Find a container by name and make sure it is running"""
+    try:
+        container = await docker.containers.get(name)
+    except DockerError as e:
+        if e.status == 404:
+            return None
+        raise
+
+    started = time.perf_counter()
+    if not container["State"]["Running"]:
+        await container.start()
+
+    return container, ContainerStatus(
+        id=container.id, source="existing", start_seconds=time.perf_counter() - started
+    )
+
+
+async def remove_container(container: DockerContainer, keep: bool) -> None:
+    try:
+        await container.stop()
+        if not keep:
+            await container.delete()
+    except DockerError as e:
+        # auto removed containers may already be gone
+        if e.status not in (404, 409):
+            raise
+
+
+class StandbyContainers:
+    """Started containers kept ready, so a connect does not wait for a pull, create and start"""
+
+    def __init__(self, server: DockerMCPServer) -> None:
+        self.server = server
+        self.containers: list[tuple[DockerContainer, ContainerStatus]] = []
+        self._docker: Docker | None = None
+        self._filling: asyncio.Task | None = None
+
+    def fill(self) -> None:
+        """Start containers in the background until the standby pool is full"""
+        if self.server.standby_containers == 0:
+            return
+
+        if self._filling is None or self._filling.done():
+            self._filling = asyncio.create_task(self._fill())
+
+    async def _fill(self) -> None:
+        if self._docker is None:
+            self._docker = Docker()
+
+        while len(self.containers) < self.server.standby_containers:
+            try:
+                standby = await create_container(self._docker, self.server)
+            except Exception as e:
+                logger.error(f"failed to start a standby container for {self.server.image}: {e}")
+                return
+
+            logger.debug(f"standby container {standby[0].id} ready")
+            self.containers.append(standby)
+
+    def take(self) -> tuple[DockerContainer, ContainerStatus] | None:
+        if not self.containers:
+            return None
+
+        container, status = self.containers.pop(0)
+        self.fill()
+        return container, status.model_copy(update={"source": "standby"})
+
+    async def close(self) -> None:
+        if self._filling is not None:
+            self._filling.cancel()
+
+        for container, _ in self.containers:
+            await remove_container(container, keep=False)
+        self.containers = []
+
+        if self._docker is not None:
+            await self._docker.close()
+            self._docker = None
+
+
 @asynccontextmanager
-async def docker_client(server: DockerMCPServer):
+async def docker_client(
+    server: DockerMCPServer,
+    standby: Optional[StandbyContainers] = None,
+    on_started: Optional[Callable[[ContainerStatus], None]] = None,
+):
     """
     Client transport for Docker: this will connect to a server by
     running a Docker container and communicating with it over its stdin/stdout.
+
+    A container named by container_name is reused if it exists, otherwise a
+    standby container is used when one is ready before a new one is created.
     """
     read_stream: MemoryObjectReceiveStream[types.JSONRPCMessage | Exception]
     read_stream_writer: MemoryObjectSendStream[types.JSONRPCMessage | Exception]
@@ -20,52 +216,45 @@ async def docker_client(server: DockerMCPServer):
     write_stream: MemoryObjectSendStream[types.JSONRPCMessage]
     write_stream_reader: MemoryObjectReceiveStream[types.JSONRPCMessage]
 
-    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
-    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(server.message_buffer)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(server.message_buffer)
 
     docker = Docker()
 
     try:
-        # Pull the image if not available
-        await docker.images.pull(server.image)
+        acquired = None
+        if server.container_name is not None:
+            acquired = await existing_container(docker, server.container_name)
+        elif standby is not None:
+            acquired = standby.take()
 
-        # Create the container
-        container = await docker.containers.create({
-            "Image": server.image,
-            "Args": server.args,
-            "OpenStdin": True,
-            "AttachStdout": True,
-            "AttachStderr": True,
-            "Tty": False,
-            "HostConfig": {"AutoRemove": True},
-        })
+        if acquired is None:
+            acquired = await create_container(docker, server)
 
-        await container.start()
+        container, startup = acquired
         logger.debug(f"Started Docker container {container.id}")
 
-        # Attach to the container's input/output streams
-        attach_result = container.attach(stdout=True, stdin=True)
-
         async def read_from_stdout():
             try:
                 async with read_stream_writer:
-                    buffer = ""
-                    while True: 
+                    framer = LineFramer(server.max_message_bytes)
+                    while True:
                         msg = await attach_result.read_out()
                         if msg is None:
-                            continue
-                        chunk = msg.data
-                        if isinstance(chunk, bytes):
-                            chunk = chunk.decode("utf-8")
-                            lines = (buffer + chunk).split("\n")
-                            buffer = lines.pop()
-
-                            for line in lines:
-                                try:
-                                    json_message = types.JSONRPCMessage.model_validate_json(line)
-                                    await read_stream_writer.send(json_message)
-                                except Exception as exc:
-                                    await read_stream_writer.send(exc)
+                            # the container closed its output
+                            logger.debug(f"Docker container {container.id} closed stdout")
+                            break
+
+                        for line in framer.feed(msg.data):
+                            if isinstance(line, Exception):
+                                await read_stream_writer.send(line)
+                                continue
+
+                            try:
+                                json_message = types.JSONRPCMessage.model_validate_json(line)
+                                await read_stream_writer.send(json_message)
+                            except Exception as exc:
+                                await read_stream_writer.send(exc)
             except anyio.ClosedResourceError:
                 await anyio.lowlevel.checkpoint()
 
@@ -79,13 +268,19 @@ async def docker_client(server: DockerMCPServer):
                 await anyio.lowlevel.checkpoint()
 
         try:
-            async with anyio.create_task_group() as tg:
-                tg.start_soon(read_from_stdout)
-                tg.start_soon(write_to_stdin)
-                yield read_stream, write_stream
+            # Attach to the container's input/output streams
+            started = time.perf_counter()
+            async with container.attach(stdout=True, stdin=True) as attach_result:
+                startup.attach_seconds = time.perf_counter() - started
+                if on_started is not None:
+                    on_started(startup)
+
+                async with anyio.create_task_group() as tg:
+                    tg.start_soon(read_from_stdout)
+                    tg.start_soon(write_to_stdin)
+                    yield read_stream, write_stream
         finally:
-            await container.stop()
-            await container.delete()
+            await remove_container(container, keep=server.container_name is not None)
 
     except Exception as e:
         logger.error(f"Error in docker client: {e}")
@@ -3,7 +3,6 @@ from mcp.server import Server, NotificationOptions
 from mcp.server.models import InitializationOptions
 from pydantic import AnyUrl
 from mcp_clients.McpClientManager import ClientManager
-from loguru import logger
 
 __all__ = ["server", "options"]
 
@@ -11,31 +10,28 @@ server = Server("MCP-Bridge")
 
 ## list functions
 
+# the servers are asked at once and the ones that do not answer in time are left out,
+# the handlers are registered directly so the result can name them in its _meta
 
-@server.list_prompts()
-async def list_prompts() -> list[types.Prompt]:
-    prompts = []
-    for name, client in ClientManager.get_clients():
-        # if client is None, then we cannot list the prompts
-        if client is None:
-            logger.error(f"Client '{name}' not found")
-            continue
 
-        client_prompts = await client.list_prompts()
-        prompts.extend(client_prompts.prompts)
-    return prompts
+def unavailable_meta(unavailable: dict[str, str]) -> dict | None:
+    return {"unavailable": unavailable} if unavailable else None
 
 
-@server.list_resources()
-async def list_resources() -> list[types.Resource]:
-    resources = []
-    for name, client in ClientManager.get_clients():
-        try:
-            client_resources = await client.list_resources()
-            resources.extend(client_resources.resources)
-        except Exception as e:
-            logger.error(f"Error listing resources for {name}: {e}")
-    return resources
+async def list_prompts(_: types.ListPromptsRequest) -> types.ServerResult:
+    results, unavailable = await ClientManager.fan_out(lambda client: client.list_prompts())
+    prompts = [prompt for result in results.values() for prompt in result.prompts]
+    return types.ServerResult(
+        types.ListPromptsResult(prompts=prompts, _meta=unavailable_meta(unavailable))
+    )
+
+
+async def list_resources(_: types.ListResourcesRequest) -> types.ServerResult:
+    results, unavailable = await ClientManager.fan_out(lambda client: client.list_resources())
+    resources = [resource for result in results.values() for resource in result.resources]
+    return types.ServerResult(
+        types.ListResourcesResult(resources=resources, _meta=unavailable_meta(unavailable))
+    )
 
 
 @server.list_resource_templates()
@@ -43,18 +39,17 @@ async def list_resource_templates() -> list[types.ResourceTemplate]:
     return []
 
 
-@server.list_tools()
-async def list_tools() -> list[types.Tool]:
-    tools = []
-    for name, client in ClientManager.get_clients():
-        # if client is None, then we cannot list the tools
-        if client is None:
-            logger.error(f"Client '{name}' not found")
-            continue
+async def list_tools(_: types.ListToolsRequest) -> types.ServerResult:
+    results, unavailable = await ClientManager.fan_out(lambda client: client.list_tools())
+    tools = [tool for result in results.values() for tool in result.tools]
+    return types.ServerResult(
+        types.ListToolsResult(tools=tools, _meta=unavailable_meta(unavailable))
+    )
 
-        client_tools = await client.list_tools()
-        tools.extend(client_tools.tools)
-    return tools
+
+server.request_handlers[types.ListPromptsRequest] = list_prompts
+server.request_handlers[types.ListResourcesRequest] = list_resources
+server.request_handlers[types.ListToolsRequest] = list_tools
 
 
 ## get functions
@@ -62,7 +57,7 @@ async def list_tools() -> list[types.Tool]:
 
 @server.get_prompt()
 async def get_prompt(name: str, args: dict[str, str] | None) -> types.GetPromptResult:
-    client = await ClientManager.get_client_from_prompt(name)
+    client = ClientManager.get_client_from_prompt(name)
 
     # if client is None, then we cannot get the prompt
     if client is None:
@@ -81,29 +76,27 @@ async def get_prompt(name: str, args: dict[str, str] | None) -> types.GetPromptR
 
 @server.read_resource()
 async def handle_read_resource(uri: AnyUrl) -> str | bytes:
-    for name, client in ClientManager.get_clients():
-        try:
-            client_resources = await client.list_resources()
-            if str(uri) in map(lambda x: str(x.uri), client_resources.resources):
-                response = await client.read_resource(uri)
-                for resource in response:
-                    if resource.mimeType == "text/plain":
-                        assert isinstance(resource, types.TextResourceContents)
-                        assert type(resource.text) is str
-                        return resource.text
-
-                    elif resource.mimeType == "application/octet-stream":
-                        assert isinstance(resource, types.BlobResourceContents)
-                        assert type(resource.blob) is bytes
-                        return resource.blob
-
-                    else:
-                        raise Exception(
-                            f"Unsupported resource type: {resource.mimeType}"
-                        )
-
-        except Exception as e:
-            logger.error(f"Error listing resources for {name}: {e}")
+    client = await ClientManager.find_client_for_resource(str(uri))
+
+    if client is None:
+        raise Exception(f"Resource '{uri}' not found")
+
+    response = await client.read_resource(uri)
+    for resource in response:
+        if resource.mimeType == "text/plain":
+            assert isinstance(resource, types.TextResourceContents)
+            assert type(resource.text) is str
+            return resource.text
+
+        elif resource.mimeType == "application/octet-stream":
+            assert isinstance(resource, types.BlobResourceContents)
+            assert type(resource.blob) is bytes
+            return resource.blob
+
+        else:
+            raise Exception(
+                f"Unsupported resource type: {resource.mimeType}"
+            )
 
     raise Exception(f"Resource '{uri}' not found")
 
@@ -112,7 +105,7 @@ async def handle_read_resource(uri: AnyUrl) -> str | bytes:
 async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
-    client = await ClientManager.get_client_from_tool(name)
+    client = ClientManager.get_client_from_tool(name)
 
     # if client is None, then we cannot call the tool
     if client is None:
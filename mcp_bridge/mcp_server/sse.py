@@ -1,20 +1,43 @@
 import asyncio
 from anyio import BrokenResourceError
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from .sse_transport import SseServerTransport
 from fastapi import APIRouter, Request
 from pydantic import ValidationError
 
+from loguru import logger
+
 from .server import server, options
+from config import config
+from metrics import bridge_sessions, bridge_sessions_rejected
 
 router = APIRouter(prefix="/sse")
 
-sse = SseServerTransport("/mcp-server/sse/messages")
+
+class StreamSent(Response):
+    """Returned once the SSE stream is over, connect_sse already sent the whole response"""
+
+    async def __call__(self, scope, receive, send) -> None:
+        pass
+
+
+sse = SseServerTransport(
+    "/mcp-server/sse/messages",
+    buffer_size=config.server_sessions.buffer_size,
+    max_sessions=config.server_sessions.max_sessions,
+    idle_timeout=config.server_sessions.idle_timeout,
+)
 
 
 @router.get("/", response_class=StreamingResponse)
 async def handle_sse(request: Request):
+    if sse.at_capacity():
+        logger.warning(f"refusing SSE client, {sse.session_count} sessions are open")
+        bridge_sessions_rejected.inc()
+        return Response("Too many sessions", status_code=503, headers={"Retry-After": "1"})
+
     async with sse.connect_sse(request) as streams:
+        bridge_sessions.inc()
         try:
             await server.run(streams[0], streams[1], options)
         except BrokenResourceError:
@@ -25,10 +48,14 @@ async def handle_sse(request: Request):
             pass
         except Exception:
             raise
+        finally:
+            bridge_sessions.dec()
     await request.close()
+    return StreamSent()
 
 
 @router.post("/messages")
 async def handle_messages(request: Request):
-    await sse.handle_post_message(request.scope, request.receive, request._send)
+    response = await sse.handle_post_message(request.scope, request.receive, request._send)
     await request.close()
+    return response
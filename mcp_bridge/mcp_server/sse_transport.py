@@ -5,10 +5,14 @@ They try to directly contron the ASGI lifespan which causes issues with fastapi
 
 also switched the logger to loguru since we are vendoring it anyway
 
+sessions are tracked so they can be closed when their client disconnects or goes
+idle, and their streams are buffered so a slow client does not stall the server
+
 """
 
+import time
 from contextlib import asynccontextmanager
-from typing import Any
+from typing import Any, Optional
 from urllib.parse import quote
 from uuid import UUID, uuid4
 
@@ -23,10 +27,36 @@ from starlette.types import Receive, Scope, Send
 import mcp.types as types
 
 from loguru import logger
+from metrics import bridge_sessions_evicted, bridge_session_backpressure
 
 logger.disable("mcp_server.sse_transport")
 
 
+class SseSession:
+    """A connected SSE client and the stream its POSTed messages go to"""
+
+    def __init__(self, writer: MemoryObjectSendStream[types.JSONRPCMessage | Exception]) -> None:
+        self.writer = writer
+        self.last_active = time.monotonic()
+        self.pending = 0  # requests from the client that were not answered yet
+
+    def received(self, message: types.JSONRPCMessage) -> None:
+        self.last_active = time.monotonic()
+        if isinstance(message.root, types.JSONRPCRequest):
+            self.pending += 1
+
+    def sent(self, message: types.JSONRPCMessage) -> None:
+        self.last_active = time.monotonic()
+        if isinstance(message.root, (types.JSONRPCResponse, types.JSONRPCError)):
+            self.pending = max(0, self.pending - 1)
+
+    def idle_seconds(self) -> float:
+        """Seconds since the last message, a session waiting for an answer is never idle"""
+        if self.pending:
+            return 0.0
+        return time.monotonic() - self.last_active
+
+
 class SseServerTransport:
     """
     SSE server transport for MCP. This class provides _two_ ASGI applications,
@@ -40,21 +70,53 @@ class SseServerTransport:
     """
 
     _endpoint: str
-    _read_stream_writers: dict[
-        UUID, MemoryObjectSendStream[types.JSONRPCMessage | Exception]
-    ]
-
-    def __init__(self, endpoint: str) -> None:
+    _sessions: dict[UUID, SseSession]
+
+    def __init__(
+        self,
+        endpoint: str,
+        buffer_size: int = 0,
+        max_sessions: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+    ) -> None:
         """
         Creates a new SSE server transport, which will direct the client to POST
         messages to the relative or absolute URL given.
+
+        buffer_size is the number of messages each stream of a session holds before
+        its sender has to wait, sessions beyond max_sessions are refused and sessions
+        idle for idle_timeout seconds are closed.
         """
 
         super().__init__()
         self._endpoint = endpoint
-        self._read_stream_writers = {}
+        self._sessions = {}
+        self._buffer_size = buffer_size
+        self._max_sessions = max_sessions
+        self._idle_timeout = idle_timeout
         logger.debug(f"SseServerTransport initialized with endpoint: {endpoint}")
 
+    @property
+    def session_count(self) -> int:
+        return len(self._sessions)
+
+    def at_capacity(self) -> bool:
+        """Whether a new session would exceed max_sessions"""
+        return self._max_sessions is not None and len(self._sessions) >= self._max_sessions
+
+    async def _close_when_idle(self, session_id: UUID, session: SseSession) -> None:
+        assert self._idle_timeout is not None
+        while True:
+            idle = session.idle_seconds()
+            if idle >= self._idle_timeout:
+                break
+            await anyio.sleep(self._idle_timeout - idle)
+
+        logger.info(f"closing session {session_id}, idle for {idle:.0f} seconds")
+        bridge_sessions_evicted.inc()
+        # the server sees the end of its input and shuts down, which ends the SSE stream
+        session.writer.close()
+
     @asynccontextmanager
     async def connect_sse(self, request: Request):
         if request.scope["type"] != "http":
@@ -68,16 +130,16 @@ class SseServerTransport:
         write_stream: MemoryObjectSendStream[types.JSONRPCMessage]
         write_stream_reader: MemoryObjectReceiveStream[types.JSONRPCMessage]
 
-        read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
-        write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+        read_stream_writer, read_stream = anyio.create_memory_object_stream(self._buffer_size)
+        write_stream, write_stream_reader = anyio.create_memory_object_stream(self._buffer_size)
 
         session_id = uuid4()
         session_uri = f"{quote(self._endpoint)}?session_id={session_id.hex}"
-        self._read_stream_writers[session_id] = read_stream_writer
+        session = self._sessions[session_id] = SseSession(read_stream_writer)
         logger.debug(f"Created new session with ID: {session_id}")
 
         sse_stream_writer, sse_stream_reader = anyio.create_memory_object_stream(
-            0, dict[str, Any]
+            self._buffer_size, dict[str, Any]
         )
 
         async def sse_writer():
@@ -87,7 +149,11 @@ class SseServerTransport:
                 logger.debug(f"Sent endpoint event: {session_uri}")
 
                 async for message in write_stream_reader:
-                    logger.debug(f"Sending message via SSE: {message}")
+                    logger.debug("Sending message via SSE: {}", message)
+                    session.sent(message)
+                    if write_stream_reader.statistics().tasks_waiting_send:
+                        # the client reads slower than the server writes
+                        bridge_session_backpressure.labels("to_client").inc()
                     await sse_stream_writer.send(
                         {
                             "event": "message",
@@ -101,11 +167,26 @@ class SseServerTransport:
             response = EventSourceResponse(
                 content=sse_stream_reader, data_sender_callable=sse_writer
             )
-            logger.debug("Starting SSE response task")
-            tg.start_soon(response, request.scope, request.receive, request._send)
 
-            logger.debug("Yielding read and write streams")
-            yield (read_stream, write_stream)
+            async def send_response():
+                try:
+                    await response(request.scope, request.receive, request._send)
+                finally:
+                    # the client is gone, nothing the server still does can reach it
+                    tg.cancel_scope.cancel()
+
+            logger.debug("Starting SSE response task")
+            tg.start_soon(send_response)
+            if self._idle_timeout is not None:
+                tg.start_soon(self._close_when_idle, session_id, session)
+
+            try:
+                logger.debug("Yielding read and write streams")
+                yield (read_stream, write_stream)
+            finally:
+                del self._sessions[session_id]
+                read_stream_writer.close()
+                logger.debug(f"Removed session with ID: {session_id}")
 
     async def handle_post_message(
         self, scope: Scope, receive: Receive, send: Send
@@ -127,25 +208,42 @@ class SseServerTransport:
             response = Response("Invalid session ID", status_code=400)
             return response
 
-        writer = self._read_stream_writers.get(session_id)
-        if not writer:
+        session = self._sessions.get(session_id)
+        if not session:
             logger.warning(f"Could not find session for ID: {session_id}")
             response = Response("Could not find session", status_code=404)
             return response
 
         json = await request.json()
-        logger.debug(f"Received JSON: {json}")
+        logger.debug("Received JSON: {}", json)
 
         try:
             message = types.JSONRPCMessage.model_validate(json)
-            logger.debug(f"Validated client message: {message}")
+            logger.debug("Validated client message: {}", message)
         except ValidationError as err:
             logger.error(f"Failed to parse message: {err}")
             response = Response("Could not parse message", status_code=400)
-            await writer.send(err)
+            await self._deliver(session, err)
             return response
 
-        logger.debug(f"Sending message to writer: {message}")
+        logger.debug("Sending message to writer: {}", message)
+        session.received(message)
+        if not await self._deliver(session, message):
+            logger.warning(f"Session {session_id} closed before the message was delivered")
+            return Response("Could not find session", status_code=404)
+
         response = Response("Accepted", status_code=202)
-        await writer.send(message)
         return response
+
+    async def _deliver(self, session: SseSession, message: types.JSONRPCMessage | Exception) -> bool:
+        """Hand a message to the server, False if the session was closed"""
+        try:
+            try:
+                session.writer.send_nowait(message)
+            except anyio.WouldBlock:
+                # the server reads slower than the client writes
+                bridge_session_backpressure.labels("to_server").inc()
+                await session.writer.send(message)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            return False
+        return True
@@ -0,0 +1,41 @@
+from .registry import (
+    registry,
+    upstream_ttft,
+    upstream_duration,
+    tool_call_duration,
+    tool_call_errors,
+    agent_iterations,
+    active_streams,
+    bridge_sessions,
+    bridge_sessions_rejected,
+    bridge_sessions_evicted,
+    bridge_session_backpressure,
+    session_reconnects,
+    tool_result_truncations,
+    tool_result_truncated_bytes,
+    budget_exhausted,
+    abandoned_requests,
+    tool_calls_cancelled,
+)
+
+# the router is imported from metrics.router, it depends on the clients that record metrics
+
+__all__ = [
+    "registry",
+    "upstream_ttft",
+    "upstream_duration",
+    "tool_call_duration",
+    "tool_call_errors",
+    "agent_iterations",
+    "active_streams",
+    "bridge_sessions",
+    "bridge_sessions_rejected",
+    "bridge_sessions_evicted",
+    "bridge_session_backpressure",
+    "session_reconnects",
+    "tool_result_truncations",
+    "tool_result_truncated_bytes",
+    "budget_exhausted",
+    "abandoned_requests",
+    "tool_calls_cancelled",
+]
@@ -0,0 +1,149 @@
+from .types import Counter, Gauge, Histogram, Metric
+
+__all__ = [
+    "registry",
+    "upstream_ttft",
+    "upstream_duration",
+    "tool_call_duration",
+    "tool_call_errors",
+    "agent_iterations",
+    "active_streams",
+    "bridge_sessions",
+    "bridge_sessions_rejected",
+    "bridge_sessions_evicted",
+    "bridge_session_backpressure",
+    "session_reconnects",
+    "tool_result_truncations",
+    "tool_result_truncated_bytes",
+    "budget_exhausted",
+    "abandoned_requests",
+    "tool_calls_cancelled",
+    "upstream_connections_in_use",
+    "upstream_connections_waiting",
+    "upstream_connections_max",
+    "upstream_requests",
+    "upstream_wait_seconds",
+]
+
+
+class MetricsRegistry:
+    """Holds every metric exposed at /metrics"""
+
+    def __init__(self) -> None:
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry: MetricsRegistry = MetricsRegistry()
+
+upstream_ttft: Histogram = registry.register(Histogram(
+    "mcp_bridge_upstream_ttft_seconds",
+    "Time from sending a streamed chat completion to its first chunk",
+))
+upstream_duration: Histogram = registry.register(Histogram(
+    "mcp_bridge_upstream_request_seconds",
+    "Total time of a chat completion request to the inference server",
+    labels=("stream",),
+))
+tool_call_duration: Histogram = registry.register(Histogram(
+    "mcp_bridge_tool_call_seconds",
+    "Latency of MCP tool calls",
+    labels=("server", "tool"),
+))
+tool_call_errors: Counter = registry.register(Counter(
+    "mcp_bridge_tool_call_errors_total",
+    "MCP tool calls that raised or returned an error result",
+    labels=("server", "tool"),
+))
+agent_iterations: Histogram = registry.register(Histogram(
+    "mcp_bridge_agent_iterations",
+    "Inference server round trips made for one chat completion request",
+    buckets=(1, 2, 3, 4, 5, 8, 12, 16, 24, 32),
+))
+active_streams: Gauge = registry.register(Gauge(
+    "mcp_bridge_active_streams",
+    "Streamed chat completions currently being served",
+))
+bridge_sessions: Gauge = registry.register(Gauge(
+    "mcp_bridge_sessions",
+    "Clients currently connected to the bridge MCP server over SSE",
+))
+bridge_sessions_rejected: Counter = registry.register(Counter(
+    "mcp_bridge_sessions_rejected_total",
+    "SSE clients of the bridge MCP server turned away because max_sessions were connected",
+))
+bridge_sessions_evicted: Counter = registry.register(Counter(
+    "mcp_bridge_sessions_evicted_total",
+    "Sessions of the bridge MCP server closed after being idle for idle_timeout",
+))
+bridge_session_backpressure: Counter = registry.register(Counter(
+    "mcp_bridge_session_backpressure_total",
+    "Messages of bridge MCP server sessions that found their buffer full and had to wait",
+    labels=("direction",),
+))
+session_reconnects: Counter = registry.register(Counter(
+    "mcp_bridge_mcp_reconnects_total",
+    "Times the session to an MCP server was restarted",
+    labels=("server",),
+))
+tool_result_truncations: Counter = registry.register(Counter(
+    "mcp_bridge_tool_result_truncations_total",
+    "Tool results truncated to fit the tool result budget",
+    labels=("tool",),
+))
+tool_result_truncated_bytes: Counter = registry.register(Counter(
+    "mcp_bridge_tool_result_truncated_bytes_total",
+    "Bytes of tool results left out to fit the tool result budget",
+    labels=("tool",),
+))
+budget_exhausted: Counter = registry.register(Counter(
+    "mcp_bridge_budget_exhausted_total",
+    "Chat completions ended early because their deadline or round limit ran out",
+    labels=("reason",),
+))
+abandoned_requests: Counter = registry.register(Counter(
+    "mcp_bridge_abandoned_requests_total",
+    "Chat completions whose client disconnected before the answer was complete",
+    labels=("stream",),
+))
+tool_calls_cancelled: Counter = registry.register(Counter(
+    "mcp_bridge_tool_calls_cancelled_total",
+    "MCP tool calls cancelled because the request that made them went away",
+    labels=("server", "tool"),
+))
+
+# the pool metrics mirror the upstream router's pool stats when /metrics is scraped
+upstream_connections_in_use: Gauge = registry.register(Gauge(
+    "mcp_bridge_upstream_connections_in_use",
+    "Connections to the inference server serving a request",
+    labels=("upstream",),
+))
+upstream_connections_waiting: Gauge = registry.register(Gauge(
+    "mcp_bridge_upstream_connections_waiting",
+    "Requests waiting for a connection to the inference server",
+    labels=("upstream",),
+))
+upstream_connections_max: Gauge = registry.register(Gauge(
+    "mcp_bridge_upstream_connections_max",
+    "Size of the connection pool to the inference server",
+    labels=("upstream",),
+))
+upstream_requests: Counter = registry.register(Counter(
+    "mcp_bridge_upstream_pool_requests_total",
+    "Requests that were assigned a connection to the inference server",
+    labels=("upstream",),
+))
+upstream_wait_seconds: Counter = registry.register(Counter(
+    "mcp_bridge_upstream_pool_wait_seconds_total",
+    "Total time requests waited for a connection to the inference server",
+    labels=("upstream",),
+))
@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from openai_clients import upstreams
+from openapi_tags import Tag
+from .registry import (
+    registry,
+    upstream_connections_in_use,
+    upstream_connections_max,
+    upstream_connections_waiting,
+    upstream_requests,
+    upstream_wait_seconds,
+)
+
+router = APIRouter(tags=[Tag.health])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Metrics in the prometheus text format"""
+    for upstream in upstreams.status():
+        upstream_connections_in_use.labels(upstream.base_url).set(upstream.pool.in_use)
+        upstream_connections_waiting.labels(upstream.base_url).set(upstream.pool.waiting)
+        upstream_connections_max.labels(upstream.base_url).set(upstream.pool.max_connections)
+        upstream_requests.labels(upstream.base_url).value = upstream.pool.requests
+        upstream_wait_seconds.labels(upstream.base_url).value = upstream.pool.wait_seconds_total
+
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
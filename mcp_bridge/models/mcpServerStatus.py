@@ -1,7 +1,54 @@
+from enum import Enum
+from typing import Literal, Optional
 from pydantic import BaseModel, Field
 
 
+class SessionState(str, Enum):
+    connecting = "connecting"  # has not connected yet
+    ready = "ready"
+    degraded = "degraded"  # lost its session and is reconnecting
+    open_circuit = "open-circuit"  # failed repeatedly, calls fail without waiting
+
+
+class ToolCacheStatus(BaseModel):
+    entries: int = Field(..., description="Number of cached results")
+    bytes: int = Field(..., description="Total size of the cached results")
+    hits: int = Field(..., description="Tool calls answered from the cache")
+    misses: int = Field(..., description="Tool calls that were not in the cache")
+
+
+class ResourceCacheStatus(BaseModel):
+    entries: int = Field(..., description="Number of cached resources")
+    bytes: int = Field(..., description="Total size of the cached contents")
+    hits: int = Field(..., description="Reads answered from the cache")
+    misses: int = Field(..., description="Reads that were not in the cache")
+    subscriptions: int = Field(..., description="Resources the bridge is subscribed to for updates")
+
+
+class ContainerStatus(BaseModel):
+    id: str = Field(..., description="Id of the docker container")
+    source: Literal["created", "standby", "existing"] = Field(
+        ..., description="Whether the container was created, taken from standby or reused by name"
+    )
+    pull_seconds: float = Field(0.0, description="Time spent pulling or checking the image")
+    create_seconds: float = Field(0.0, description="Time spent creating the container")
+    start_seconds: float = Field(0.0, description="Time spent starting the container")
+    attach_seconds: float = Field(0.0, description="Time spent attaching to the container")
+
+
 class McpServerStatus(BaseModel):
     name: str = Field(..., description="Name of the MCP server")
     online: bool = Field(..., description="Whether the server is online")
     enabled: bool = Field(True, description="Whether the server is enabled")
+    state: SessionState = Field(SessionState.ready, description="State of the session")
+    failures: int = Field(0, description="Failed connects in a row")
+    replicas: int = Field(1, description="Number of running server instances")
+    tool_cache: Optional[ToolCacheStatus] = Field(
+        None, description="Tool result cache statistics, when the cache is enabled"
+    )
+    resource_cache: Optional[ResourceCacheStatus] = Field(
+        None, description="Resource cache statistics, when the cache is enabled"
+    )
+    container: Optional[ContainerStatus] = Field(
+        None, description="Startup timings of the current container, for docker servers"
+    )
@@ -0,0 +1,27 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+
+class UpstreamPoolStatus(BaseModel):
+    max_connections: int = Field(..., description="Size of the connection pool")
+    in_use: int = Field(..., description="Connections currently serving a request")
+    waiting: int = Field(..., description="Requests waiting for a free connection")
+    saturation: float = Field(..., description="Fraction of the pool in use")
+    requests: int = Field(..., description="Requests that were assigned a connection")
+    wait_seconds_total: float = Field(
+        ..., description="Total time requests spent waiting for a connection"
+    )
+    wait_seconds_max: float = Field(
+        ..., description="Longest time a request waited for a connection"
+    )
+
+
+class UpstreamStatus(BaseModel):
+    base_url: str = Field(..., description="Base URL of the inference server")
+    models: list[str] = Field(..., description="Models routed to this server, empty means any")
+    outstanding: int = Field(..., description="Requests in flight or waiting for a connection")
+    latency_ewma: Optional[float] = Field(
+        ..., description="Moving average of the time to response headers in seconds"
+    )
+    ejected: bool = Field(..., description="Whether the server is skipped after failing")
+    pool: UpstreamPoolStatus = Field(..., description="Connection pool usage")
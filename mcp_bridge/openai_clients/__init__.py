@@ -1,6 +1,18 @@
-from .genericHttpxClient import client
+from .upstreamRouter import upstreams
 from .completion import completions
 from .chatCompletion import chat_completions
 from .streamChatCompletion import streaming_chat_completions
+from .passthrough import passthrough_chat_completions, wants_passthrough
+from .requestBudget import RequestBudget
+from . import jsonCodec
 
-__all__ = ["client", "completions", "chat_completions", "streaming_chat_completions"]
+__all__ = [
+    "upstreams",
+    "completions",
+    "chat_completions",
+    "streaming_chat_completions",
+    "passthrough_chat_completions",
+    "wants_passthrough",
+    "RequestBudget",
+    "jsonCodec",
+]
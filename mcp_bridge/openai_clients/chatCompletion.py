@@ -1,92 +1,121 @@
-from lmos_openai_types import (
-    CreateChatCompletionRequest,
-    CreateChatCompletionResponse,
-    ChatCompletionRequestMessage,
-)
-
-from .utils import call_tool, chat_completion_add_tools
-from .genericHttpxClient import client
-from mcp_clients.McpClientManager import ClientManager
-from tool_mappers import mcp2openai
+from typing import Optional
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from httpx import TimeoutException
+
+from .utils import call_tools, chat_completion_tools, tool_call_fields, tool_result_message
+from .toolPayloads import encode_request
+from .requestBudget import RequestBudget
+from .toolResults import ToolResultBudget
+from .upstreamRouter import upstreams
+from . import jsonCodec
+from metrics import agent_iterations, upstream_duration
+from tracing import start_span
+from config.logs import debug_enabled
 from loguru import logger
-import json
 
 
 async def chat_completions(
-    request: CreateChatCompletionRequest,
-) -> CreateChatCompletionResponse:
-    """performs a chat completion using the inference server"""
+    request: dict, tool_selection: Optional[str] = None, budget: Optional[RequestBudget] = None
+) -> Response:
+    """performs a chat completion using the inference server
+
+    The request is the json body sent by the client, it is only read where tools
+    and messages are concerned and is otherwise forwarded as it came.
+    """
 
-    request = await chat_completion_add_tools(request)
+    budget = budget or RequestBudget()
+    tools = await chat_completion_tools(request, tool_selection)
+    result_budget = ToolResultBudget()
 
+    iterations = 0
     while True:
-        # logger.debug(request.model_dump_json())
+        iterations += 1
+
+        if budget.expired():
+            budget.exhausted("deadline")
+            agent_iterations.observe(iterations - 1)
+            return JSONResponse(budget.completion(request.get("model")))
+
+        # the model has to answer on its last round
+        if budget.last_round(iterations):
+            request["tool_choice"] = "none"
 
-        text = (
-            await client.post(
+        span = start_span("upstream", round=iterations)
+        try:
+            upstream_response = await upstreams.client_for(request.get("model")).post(
                 "/chat/completions",
-                #content=request.model_dump_json(
-                #    exclude_defaults=True, exclude_none=True, exclude_unset=True
-                #),
-                json=request.model_dump(exclude_defaults=True, exclude_none=True, exclude_unset=True),
+                content=encode_request(request, tools),
+                timeout=budget.timeout(),
             )
-        ).text
-        logger.debug(text)
+        except TimeoutException:
+            if not budget.expired():
+                raise
+            span.end("deadline")
+            budget.exhausted("deadline")
+            agent_iterations.observe(iterations)
+            return JSONResponse(budget.completion(request.get("model")))
+        span.end()
+        upstream_duration.labels("false").observe(span.duration)  # type: ignore
+        # checked before building the message, loguru formats records before filtering them
+        if debug_enabled():
+            logger.debug("upstream response: {}", upstream_response.text)
+
         try:
-            response = CreateChatCompletionResponse.model_validate_json(text)
+            response = jsonCodec.loads(upstream_response.content)
+            choice = response["choices"][0]
+            # for some reason openrouter uses uppercase for finish_reason
+            finish_reason = str(choice["finish_reason"]).lower()
+            msg = choice["message"]
+            if not isinstance(msg, dict):
+                raise TypeError(f"message is not an object: {msg!r}")
         except Exception as e:
-            logger.error(f"Error parsing response: {text}")
+            # not a completion, most likely an error, so the client gets it as it is
+            logger.error(f"Error parsing response: {upstream_response.text}")
             logger.error(e)
-            return
-
-        msg = response.choices[0].message
-        msg = ChatCompletionRequestMessage(
-            role="assistant",
-            content=msg.content,
-            tool_calls=msg.tool_calls,
-        )  # type: ignore
-        request.messages.append(msg)
-
-        logger.debug(f"finish reason: {response.choices[0].finish_reason}")
-        if response.choices[0].finish_reason.value in ["stop", "length"]:
+            agent_iterations.observe(iterations)
+            return Response(
+                content=upstream_response.content,
+                status_code=upstream_response.status_code,
+                media_type=upstream_response.headers.get("Content-Type"),
+            )
+
+        assistant_message = {"role": "assistant", "content": msg.get("content")}
+        if msg.get("tool_calls"):
+            assistant_message["tool_calls"] = msg["tool_calls"]
+        request["messages"].append(assistant_message)
+
+        logger.debug("finish reason: {}", finish_reason)
+        # only a round that ends in tool calls goes on, any other finish reason is the answer
+        if finish_reason != "tool_calls" or not msg.get("tool_calls"):
             logger.debug("no tool calls found")
-            return response
+            agent_iterations.observe(iterations)
+            # the final answer goes back without being re-encoded
+            return Response(content=upstream_response.content, media_type="application/json")
+
+        if budget.last_round(iterations):
+            # the inference server ignored tool_choice, so its tool calls go unanswered
+            budget.exhausted("iterations")
+            agent_iterations.observe(iterations)
+            return JSONResponse(budget.completion(request.get("model"), msg.get("content")))
 
         logger.debug("tool calls found")
-        for tool_call in response.choices[0].message.tool_calls.root:
-            logger.debug(
-                f"tool call: {tool_call.function.name} arguments: {json.loads(tool_call.function.arguments)}"
-            )
+        # a malformed tool call is answered with an error instead of failing the request
+        tool_calls = [tool_call_fields(tool_call) for tool_call in msg["tool_calls"]]
+        for _, name, arguments in tool_calls:
+            logger.debug("tool call: {} arguments: {}", name, arguments)
 
-            # FIXME: this can probably be done in parallel using asyncio gather
-            tool_call_result = await call_tool(
-                tool_call.function.name, tool_call.function.arguments
-            )
-            if tool_call_result is None:
-                continue
+        tool_call_results = await call_tools(
+            [(name, arguments) for _, name, arguments in tool_calls], budget.remaining()
+        )
 
-            logger.debug(
-                f"tool call result for {tool_call.function.name}: {tool_call_result.model_dump()}"
-            )
+        # the results are appended in the order of the calls, whatever order they finished in
+        for (tool_call_id, name, _), tool_call_result in zip(tool_calls, tool_call_results):
+            if debug_enabled():
+                logger.debug("tool call result for {}: {}", name, tool_call_result.model_dump())
 
-            logger.debug(f"tool call result content: {tool_call_result.content}")
-
-            tools_content = [
-                {"type": "text", "text": part.text}
-                for part in filter(lambda x: x.type == "text", tool_call_result.content)
-            ]
-            if len(tools_content) == 0:
-                tools_content = [
-                    {"type": "text", "text": "the tool call result is empty"}
-                ]
-            request.messages.append(
-                ChatCompletionRequestMessage.model_validate(
-                    {
-                        "role": "tool",
-                        "content": tools_content,
-                        "tool_call_id": tool_call.id,
-                    }
-                )
+            request["messages"].append(
+                tool_result_message(tool_call_id, str(name), tool_call_result, result_budget)
             )
 
-            logger.debug("sending next iteration of chat completion request")
+        logger.debug("sending next iteration of chat completion request")
@@ -1,11 +1,11 @@
 from lmos_openai_types import CreateCompletionRequest
-from .genericHttpxClient import client
+from .upstreamRouter import upstreams
 
 
 async def completions(request: CreateCompletionRequest) -> dict:
     """performs a completion using the inference server"""
 
-    response = await client.post(
+    response = await upstreams.client_for(request.model).post(
         "/completions",
         json=request.model_dump(
             exclude_defaults=True, exclude_none=True, exclude_unset=True
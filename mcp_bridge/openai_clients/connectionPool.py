@@ -0,0 +1,96 @@
+import time
+from typing import Callable, Optional
+from httpx import AsyncHTTPTransport, Request, Response
+from models.upstreamPoolStatus import UpstreamPoolStatus
+
+__all__ = ["PoolStats", "InstrumentedTransport"]
+
+
+class PoolStats:
+    """Tracks how busy the connection pool to the inference server is"""
+
+    def __init__(self, max_connections: int) -> None:
+        self.max_connections = max_connections
+        self.waiting: int = 0  # requests waiting for a connection
+        self.in_use: int = 0  # requests holding a connection
+        self.requests: int = 0
+        self.wait_seconds_total: float = 0.0
+        self.wait_seconds_max: float = 0.0
+
+    def acquired(self, wait: float) -> None:
+        self.waiting -= 1
+        self.in_use += 1
+        self.requests += 1
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def status(self) -> UpstreamPoolStatus:
+        return UpstreamPoolStatus(
+            max_connections=self.max_connections,
+            in_use=self.in_use,
+            waiting=self.waiting,
+            saturation=self.in_use / self.max_connections,
+            requests=self.requests,
+            wait_seconds_total=self.wait_seconds_total,
+            wait_seconds_max=self.wait_seconds_max,
+        )
+
+
+class InstrumentedTransport(AsyncHTTPTransport):
+    """An httpx transport that records pool usage in a PoolStats
+
+    httpcore emits its first trace event once a request has been assigned a
+    connection, and a response_closed event when it gives the connection back,
+    which is what the accounting hooks into.
+    """
+
+    def __init__(
+        self,
+        stats: PoolStats,
+        on_response: Optional[Callable[[float, bool], None]] = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.stats = stats
+        self.on_response = on_response  # called with the time to response headers and success
+
+    async def handle_async_request(self, request: Request) -> Response:
+        stats = self.stats
+        started = time.perf_counter()
+        acquired = False
+        released = False
+
+        async def trace(event: str, info: dict) -> None:
+            nonlocal acquired, released
+            if not acquired:
+                acquired = True
+                stats.acquired(time.perf_counter() - started)
+
+            if event.endswith("response_closed.complete") or event.endswith(
+                "response_closed.failed"
+            ):
+                if not released:
+                    released = True
+                    stats.in_use -= 1
+
+        stats.waiting += 1
+        request.extensions = {**request.extensions, "trace": trace}
+
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException as e:
+            if not acquired:
+                stats.waiting -= 1
+            elif not released:
+                released = True
+                stats.in_use -= 1
+
+            # a cancelled request says nothing about the health of the server
+            if self.on_response is not None and isinstance(e, Exception):
+                self.on_response(time.perf_counter() - started, False)
+            raise
+
+        if self.on_response is not None:
+            self.on_response(time.perf_counter() - started, response.status_code < 500)
+
+        return response
@@ -1,8 +1,57 @@
-from httpx import AsyncClient
+from typing import Callable, Optional
+from httpx import AsyncClient, Limits, Request, Timeout
+from loguru import logger
 from config import config
+from tracing import current_request_id
+from .connectionPool import InstrumentedTransport, PoolStats
 
-client: AsyncClient = AsyncClient(
-    base_url=config.inference_server.base_url,
-    headers={"Authorization": f"Bearer {config.inference_server.api_key}", "Content-Type": "application/json"},
-    timeout=10000,
-)
+inference_server = config.inference_server
+
+
+def _transport(
+    stats: PoolStats, on_response: Optional[Callable[[float, bool], None]], http2: bool
+) -> InstrumentedTransport:
+    return InstrumentedTransport(
+        stats,
+        on_response,
+        http2=http2,
+        limits=Limits(
+            max_connections=inference_server.max_connections,
+            max_keepalive_connections=inference_server.max_keepalive_connections,
+            keepalive_expiry=inference_server.keepalive_expiry,
+        ),
+    )
+
+
+async def _forward_request_id(request: Request) -> None:
+    request_id = current_request_id()
+    if request_id is not None:
+        request.headers[config.tracing.request_id_header] = request_id
+
+
+def create_client(
+    base_url: str,
+    api_key: str,
+    stats: PoolStats,
+    on_response: Optional[Callable[[float, bool], None]] = None,
+) -> AsyncClient:
+    """Create a pooled client for an inference server"""
+
+    try:
+        transport = _transport(stats, on_response, inference_server.http2)
+    except ImportError:
+        logger.warning("http2 needs the h2 package (install the http2 extra), falling back to HTTP/1.1")
+        transport = _transport(stats, on_response, False)
+
+    return AsyncClient(
+        base_url=base_url,
+        headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+        timeout=Timeout(
+            connect=inference_server.timeouts.connect,
+            read=inference_server.timeouts.read,
+            write=inference_server.timeouts.write,
+            pool=inference_server.timeouts.pool,
+        ),
+        transport=transport,
+        event_hooks={"request": [_forward_request_id]},
+    )
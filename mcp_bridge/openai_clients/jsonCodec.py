@@ -0,0 +1,23 @@
+import json
+from typing import Any
+
+__all__ = ["loads", "dumps", "fast"]
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, see the fast-json extra
+    orjson = None  # type: ignore
+
+fast: bool = orjson is not None
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
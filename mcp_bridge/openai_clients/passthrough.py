@@ -0,0 +1,66 @@
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from httpx import Response
+from loguru import logger
+
+from config import config
+from . import jsonCodec
+from .upstreamRouter import upstreams
+
+__all__ = ["wants_passthrough", "passthrough_chat_completions"]
+
+
+def body_model(body: bytes) -> Optional[str]:
+    try:
+        return jsonCodec.loads(body).get("model")
+    except Exception:
+        return None
+
+
+def wants_passthrough(request: Request, body: bytes) -> bool:
+    """Whether the request skips the tools and goes to the inference server as it is"""
+
+    if request.headers.get(config.passthrough.header, "").lower() == "true":
+        return True
+
+    # the body is only parsed here when there are models to look for
+    if config.passthrough.models:
+        return body_model(body) in config.passthrough.models
+
+    return False
+
+
+async def relay(response: Response):
+    """The raw upstream body, the upstream connection is released however the relay ends"""
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        # a background task would be skipped when the client disconnects
+        await response.aclose()
+
+
+async def passthrough_chat_completions(body: bytes) -> StreamingResponse:
+    """Forward the body unchanged and stream the upstream response back byte for byte"""
+
+    logger.debug("forwarding chat completion without tools")
+
+    # with a single catch-all upstream the body does not need to be parsed at all
+    model = body_model(body) if upstreams.routes_by_model else None
+    client = upstreams.client_for(model)
+    response = await client.send(
+        client.build_request(
+            "POST",
+            "/chat/completions",
+            content=body,
+            headers={"Content-Type": "application/json"},
+        ),
+        stream=True,
+    )
+
+    return StreamingResponse(
+        content=relay(response),
+        status_code=response.status_code,
+        media_type=response.headers.get("Content-Type"),
+    )
@@ -0,0 +1,103 @@
+import time
+from typing import Optional
+from uuid import uuid4
+from httpx import Timeout
+from loguru import logger
+
+from config import config
+from config.final import AgentLoop
+from metrics import budget_exhausted
+
+__all__ = ["RequestBudget"]
+
+
+class RequestBudget:
+    """Deadline and round limit of one chat completion request
+
+    The deadline caps the timeouts of every upstream request and tool call made
+    for the request. When a budget runs out the loop ends with budget_message as
+    the answer and a "length" finish reason, like a model cut off by max_tokens.
+    """
+
+    def __init__(self, deadline: Optional[str] = None, settings: AgentLoop = config.agent_loop) -> None:
+        self.settings = settings
+
+        seconds = settings.deadline
+        if deadline is not None:
+            try:
+                requested = float(deadline)
+            except ValueError:
+                logger.warning(f"ignoring invalid deadline header: {deadline}")
+            else:
+                if requested > 0:
+                    seconds = requested if seconds is None else min(seconds, requested)
+
+        self.deadline: Optional[float] = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, None when there is none"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def last_round(self, iterations: int) -> bool:
+        """Whether this round is the last one the model gets, it should answer without tools"""
+        return self.settings.max_iterations is not None and iterations >= self.settings.max_iterations
+
+    def timeout(self) -> Timeout:
+        """Upstream timeouts with every phase capped at the time left"""
+        timeouts = config.inference_server.timeouts
+        remaining = self.remaining()
+        if remaining is None:
+            return Timeout(
+                connect=timeouts.connect, read=timeouts.read, write=timeouts.write, pool=timeouts.pool
+            )
+
+        def cap(value: Optional[float]) -> float:
+            return remaining if value is None else min(value, remaining)
+
+        return Timeout(
+            connect=cap(timeouts.connect),
+            read=cap(timeouts.read),
+            write=cap(timeouts.write),
+            pool=cap(timeouts.pool),
+        )
+
+    def exhausted(self, reason: str) -> None:
+        logger.warning(f"chat completion stopped, its {reason} budget ran out")
+        budget_exhausted.labels(reason).inc()
+
+    def completion(self, model: Optional[str], content: Optional[str] = None) -> dict:
+        """The answer sent in place of the model's when the budget ran out"""
+        return {
+            "id": f"chatcmpl-{uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content or self.settings.budget_message},
+                    "finish_reason": "length",
+                }
+            ],
+        }
+
+    def chunk(self, model: Optional[str], content: Optional[str] = None) -> dict:
+        """The last chunk of a stream that ran out of budget"""
+        return {
+            "id": f"chatcmpl-{uuid4().hex}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {"content": content if content is not None else self.settings.budget_message},
+                    "finish_reason": "length",
+                }
+            ],
+        }
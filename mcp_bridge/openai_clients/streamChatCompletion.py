@@ -1,217 +1,339 @@
+import asyncio
 import json
+import time
 from socket import timeout
 from typing import Optional
 from fastapi import HTTPException
-from lmos_openai_types import (
-    ChatCompletionMessageToolCall,
-    ChatCompletionRequestMessage,
-    CreateChatCompletionRequest,
-    CreateChatCompletionStreamResponse,
-    Function1,
+from httpx import TimeoutException
+from lmos_openai_types import CreateChatCompletionStreamResponse
+from config.logs import debug_enabled
+from .utils import (
+    call_tool,
+    chat_completion_tools,
+    tool_call_error,
+    tool_result_message,
 )
-from .utils import call_tool, chat_completion_add_tools
-from models import SSEData
-from .genericHttpxClient import client
+from .toolPayloads import encode_request
+from .requestBudget import RequestBudget
+from .toolResults import ToolResultBudget
+from . import jsonCodec
+from metrics import abandoned_requests, active_streams, agent_iterations, upstream_duration, upstream_ttft
+from tracing import start_span
+from .upstreamRouter import upstreams
 from mcp_clients.McpClientManager import ClientManager
 from tool_mappers import mcp2openai
 from loguru import logger
 from httpx_sse import aconnect_sse
 
 from sse_starlette.sse import EventSourceResponse, ServerSentEvent
+from starlette.background import BackgroundTask
 
 
-async def streaming_chat_completions(request: CreateChatCompletionRequest):
+class StreamedToolCall:
+    """A tool call assembled from streamed deltas, started as soon as its arguments are complete"""
+
+    def __init__(self) -> None:
+        self.id: str = ""
+        self.name: str = ""
+        self.argument_parts: list[str] = []
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def arguments(self) -> str:
+        return "".join(self.argument_parts)
+
+    def add_arguments(self, fragment: str) -> None:
+        if fragment:
+            self.argument_parts.append(fragment)
+
+    def arguments_complete(self) -> bool:
+        # a complete json object cannot be extended by later deltas,
+        # so once it parses the call can be started safely
+        if not self.argument_parts or not self.argument_parts[-1].rstrip().endswith("}"):
+            return False
+
+        try:
+            json.loads(self.arguments)
+        except json.JSONDecodeError:
+            return False
+
+        return True
+
+    def start(self, timeout: Optional[float] = None) -> None:
+        if self.task is None:
+            logger.debug("starting tool call {} ({})", self.name, self.id)
+            self.task = asyncio.create_task(call_tool(self.name, self.arguments, timeout))
+
+
+async def streaming_chat_completions(
+    request: dict, tool_selection: Optional[str] = None, budget: Optional[RequestBudget] = None
+):
     # raise NotImplementedError("Streaming Chat Completion is not supported")
 
+    # an unknown model fails with a 404 here, once the stream has started its status is sent
+    upstreams.select(request.get("model"))
+
     try:
+        events = track_stream(chat_completions(request, tool_selection, budget))
         return EventSourceResponse(
-            content=chat_completions(request),
+            content=events,
             media_type="text/event-stream",
             headers={"Cache-Control": "no-cache"},
+            # when the client disconnects while an event is being sent the generator is left
+            # suspended, closing it stops the upstream stream and the pending tool calls
+            background=BackgroundTask(events.aclose),
         )
 
     except Exception as e:
         logger.error(e)
 
 
-async def chat_completions(request: CreateChatCompletionRequest):
+async def track_stream(events):
+    """counts the stream as active for as long as it is being served"""
+    active_streams.inc()
+    try:
+        async for event in events:
+            yield event
+    except (GeneratorExit, asyncio.CancelledError):
+        logger.debug("client went away, abandoning the stream")
+        abandoned_requests.labels("true").inc()
+        raise
+    finally:
+        active_streams.dec()
+        # leaving the loop early does not close the events
+        await events.aclose()
+
+
+async def chat_completions(
+    request: dict, tool_selection: Optional[str] = None, budget: Optional[RequestBudget] = None
+):
     """performs a chat completion using the inference server"""
 
-    request.stream = True
+    request["stream"] = True
 
-    request = await chat_completion_add_tools(request)
+    budget = budget or RequestBudget()
+    tools = await chat_completion_tools(request, tool_selection)
+    result_budget = ToolResultBudget()
 
+    iterations = 0
     fully_done = False
+    answer_started = False  # whether the last round forwarded any content
     while not fully_done:
-        # json_data = request.model_dump_json(
-        #     exclude_defaults=True, exclude_none=True, exclude_unset=True
-        # )
+        if budget.expired():
+            budget.exhausted("deadline")
+            # an answer that was cut off just ends, like one that hit max_tokens
+            final = budget.chunk(request.get("model"), "" if answer_started else None)
+            yield jsonCodec.dumps(final).decode()
+            break
 
-        request.model = "gpt-4o-mini"
+        iterations += 1
+        answer_started = False
 
-        json_data = json.dumps(request.model_dump(
-            exclude_defaults=True, exclude_none=True, exclude_unset=True
-        ))
+        # the model has to answer on its last round
+        if budget.last_round(iterations):
+            request["tool_choice"] = "none"
+
+        json_data = encode_request(request, tools)
 
         # logger.debug(json_data)
 
-        last: Optional[CreateChatCompletionStreamResponse] = None  # last message
+        finish_reason: Optional[str] = None
 
-        tool_call_name: str = ""
-        tool_call_json: str = ""
+        tool_calls: dict[int, StreamedToolCall] = {}  # keyed by the tool call index
         should_forward: bool = True
-        response_content: str = ""
-        tool_call_id: str = ""
-
-        async with aconnect_sse(
-            client, "post", "/chat/completions", content=json_data
-        ) as event_source:
+        content_parts: list[str] = []
+
+        span = start_span("upstream", round=iterations)
+        first_chunk = True
+
+        try:
+            async with aconnect_sse(
+                upstreams.client_for(request.get("model")),
+                "post",
+                "/chat/completions",
+                content=json_data,
+                timeout=budget.timeout(),
+            ) as event_source:
             
-            # check if the content type is correct because the aiter_sse method
-            # will raise an exception if the content type is not correct
-            if "Content-Type" in event_source.response.headers:
-                content_type = event_source.response.headers["Content-Type"]
-                if "text/event-stream" not in content_type:
-                    logger.error(f"Unexpected Content-Type: {content_type}")
-                    error_data = await event_source.response.aread()
-                    logger.error(f"Request URL: {event_source.response.url}")
-                    logger.error(f"Request Data: {json_data}")
-                    logger.error(f"Response Status: {event_source.response.status_code}")
-                    logger.error(f"Response Data: {error_data.decode(event_source.response.encoding or 'utf-8')}")
-                    raise HTTPException(status_code=500, detail="Unexpected Content-Type")
-
-            # iterate over the SSE stream
-            async for sse in event_source.aiter_sse():
-                event = sse.event
-                data = sse.data
-                id = sse.id
-                retry = sse.retry
-
-                logger.debug(
-                    f"event: {event},\ndata: {data},\nid: {id},\nretry: {retry}"
-                )
-
-                # handle if the SSE stream is done
-                if data == "[DONE]":
-                    logger.debug("inference serverstream done")
-                    break
-
-                # for some reason openrouter uses uppercase for finish_reason
-                try:
-                    data['choices'][0]['finish_reason'] = data['choices'][0]['finish_reason'].lower() # type: ignore
-                except Exception as e:
-                    logger.debug(f"failed to lowercase finish_reason: {e}")
-
-                try:
-                    parsed_data = CreateChatCompletionStreamResponse.model_validate_json(
-                        data
-                    )
-                except Exception as e:
-                    logger.debug(data)
-                    raise e
-
-                # add the delta to the response content
-                content = parsed_data.choices[0].delta.content
-                content = content if content is not None else ""
-                response_content += content
-
-                # handle stop reasons
-                if parsed_data.choices[0].finish_reason is not None:
-                    if parsed_data.choices[0].finish_reason.value in [
-                        "stop",
-                        "length",
-                    ]:
-                        fully_done = True
-                    else:
+                # check if the content type is correct because the aiter_sse method
+                # will raise an exception if the content type is not correct
+                if "Content-Type" in event_source.response.headers:
+                    content_type = event_source.response.headers["Content-Type"]
+                    if "text/event-stream" not in content_type:
+                        logger.error(f"Unexpected Content-Type: {content_type}")
+                        error_data = await event_source.response.aread()
+                        logger.error(f"Request URL: {event_source.response.url}")
+                        logger.error(f"Request Data: {json_data.decode()}")
+                        logger.error(f"Response Status: {event_source.response.status_code}")
+                        logger.error(f"Response Data: {error_data.decode(event_source.response.encoding or 'utf-8')}")
+                        raise HTTPException(status_code=500, detail="Unexpected Content-Type")
+
+                # iterate over the SSE stream
+                async for sse in event_source.aiter_sse():
+                    if first_chunk:
+                        first_chunk = False
+                        upstream_ttft.observe(time.perf_counter() - span.start)
+
+                    if budget.expired():
+                        break
+
+                    data = sse.data
+                    if debug_enabled():
+                        logger.debug("upstream chunk: {}", data)
+
+                    # handle if the SSE stream is done
+                    if data == "[DONE]":
+                        logger.debug("inference serverstream done")
+                        break
+
+                    # classify the chunk with a plain json parse, content chunks make up
+                    # nearly all of a stream and are forwarded as they came
+                    chunk = jsonCodec.loads(data)
+                    choices = chunk.get("choices") or [{}]
+                    delta = choices[0].get("delta") or {}
+                    chunk_finish_reason = choices[0].get("finish_reason")
+
+                    if not delta.get("tool_calls") and chunk_finish_reason is None:
+                        content = delta.get("content")
+                        if content:
+                            content_parts.append(content)
+
+                        if should_forward:
+                            answer_started = answer_started or bool(content)
+                            yield data
+                        continue
+
+                    # tool call and finish chunks are validated in full
+                    # for some reason openrouter uses uppercase for finish_reason
+                    if isinstance(chunk_finish_reason, str):
+                        choices[0]["finish_reason"] = chunk_finish_reason.lower()
+
+                    try:
+                        parsed_data = CreateChatCompletionStreamResponse.model_validate(chunk)
+                    except Exception as e:
+                        logger.debug(data)
+                        raise e
+
+                    # add the delta to the response content
+                    content = parsed_data.choices[0].delta.content
+                    if content:
+                        content_parts.append(content)
+
+                    # handle stop reasons
+                    if parsed_data.choices[0].finish_reason is not None:
+                        finish_reason = parsed_data.choices[0].finish_reason.value
+                        if finish_reason == "tool_calls":
+                            should_forward = False
+                        else:
+                            fully_done = True
+
+                    # this manages the incoming tool call schema, deltas of several
+                    # calls may be interleaved so they are accumulated per index
+                    if parsed_data.choices[0].delta.tool_calls is not None:
                         should_forward = False
+                        for tool_call_delta in parsed_data.choices[0].delta.tool_calls:
+                            tool_call = tool_calls.setdefault(
+                                tool_call_delta.index, StreamedToolCall()
+                            )
+
+                            if tool_call_delta.id is not None and tool_call.id == "":
+                                tool_call.id = tool_call_delta.id
+
+                            if tool_call_delta.function is not None:
+                                name = tool_call_delta.function.name
+                                if name is not None and tool_call.name == "":
+                                    tool_call.name = name
+
+                                tool_call.add_arguments(tool_call_delta.function.arguments)
+
+                            # run the tool while the model is still streaming the other calls
+                            if tool_call.name != "" and tool_call.arguments_complete():
+                                tool_call.start(budget.remaining())
+
+                    # forward SSE messages to the client, we do not want to
+                    # forward tool call json to the client
+                    if should_forward:
+                        yield data
+
+            span.end()
+            upstream_duration.labels("true").observe(span.duration)  # type: ignore
+
+            # the deadline passed mid stream, the next round ends the response
+            if finish_reason is None and budget.expired():
+                continue
+
+            ordered_calls = [tool_calls[index] for index in sorted(tool_calls)]
+
+            # only a round that ends in tool calls goes on, any other finish reason,
+            # or a stream that ended without one, is the answer
+            if finish_reason != "tool_calls" or not ordered_calls:
+                logger.debug("no tool calls found")
+                fully_done = True
+                continue
+
+            if budget.last_round(iterations):
+                # the inference server ignored tool_choice, so its tool calls go unanswered
+                budget.exhausted("iterations")
+                yield jsonCodec.dumps(budget.chunk(request.get("model"))).decode()
+                fully_done = True
+                continue
+
+            logger.debug("tool calls found")
+            for tool_call in ordered_calls:
+                logger.debug("tool call: {} arguments: {}", tool_call.name, tool_call.arguments)
+
+                # calls whose arguments never parsed are started now and fail in call_tool
+                tool_call.start(budget.remaining())
+
+            # add received message to the history
+            request["messages"].append(
+                {
+                    "role": "assistant",
+                    "content": "".join(content_parts),
+                    "tool_calls": [
+                        {
+                            "id": tool_call.id,
+                            "type": "function",
+                            "function": {"name": tool_call.name, "arguments": tool_call.arguments},
+                        }
+                        for tool_call in ordered_calls
+                    ],
+                }
+            )
+
+            tool_call_results = await asyncio.gather(
+                *(tool_call.task for tool_call in ordered_calls if tool_call.task is not None),
+                return_exceptions=True,  # a failing call must not cancel its siblings
+            )
+
+            # the results are appended in the order of the calls, whatever order they finished in
+            for tool_call, tool_call_result in zip(ordered_calls, tool_call_results):
+                if isinstance(tool_call_result, BaseException):
+                    tool_call_result = tool_call_error(tool_call.name, tool_call_result)
 
-                # this manages the incoming tool call schema
-                # most of this is assertions to please mypy
-                if parsed_data.choices[0].delta.tool_calls is not None:
-                    should_forward = False
-                    assert (
-                        parsed_data.choices[0].delta.tool_calls[0].function is not None
-                    )
-
-                    name = parsed_data.choices[0].delta.tool_calls[0].function.name
-                    name = name if name is not None else ""
-                    tool_call_name = name if tool_call_name == "" else tool_call_name
-
-                    call_id = parsed_data.choices[0].delta.tool_calls[0].id
-                    call_id = call_id if call_id is not None else ""
-                    tool_call_id = id if tool_call_id == "" else tool_call_id
-
-                    arg = parsed_data.choices[0].delta.tool_calls[0].function.arguments
-                    tool_call_json += arg if arg is not None else ""
-
-                # forward SSE messages to the client
-                logger.debug(f"{should_forward=}")
-                if should_forward:
-                    # we do not want to forward tool call json to the client
-                    logger.debug("forwarding message")
-                    yield SSEData.model_validate_json(sse.data).model_dump_json()
-
-                # save the last message
-                last = parsed_data
-
-        # ideally we should check this properly
-        assert last is not None
-        assert last.choices[0].finish_reason is not None
-
-        if last.choices[0].finish_reason.value in ["stop", "length"]:
-            logger.debug("no tool calls found")
-            fully_done = True
-            continue
-
-        logger.debug("tool calls found")
-        logger.debug(
-            f"{tool_call_name=} {tool_call_json=}"
-        )  # this should not be error but its easier to debug
-
-        # add received message to the history
-        msg = ChatCompletionRequestMessage(
-            role="assistant",
-            content=response_content,
-            tool_calls=[
-                ChatCompletionMessageToolCall(
-                    id=tool_call_id,
-                    type="function",
-                    function=Function1(name=tool_call_name, arguments=tool_call_json),
+                if debug_enabled():
+                    logger.debug("tool call result for {}: {}", tool_call.name, tool_call_result.model_dump())
+
+                request["messages"].append(
+                    tool_result_message(tool_call.id, tool_call.name, tool_call_result, result_budget)
                 )
-            ],
-        )  # type: ignore
-        request.messages.append(msg)
-
-        #### MOST OF THIS IS COPY PASTED FROM CHAT_COMPLETIONS
-        # FIXME: this can probably be done in parallel using asyncio gather
-        tool_call_result = await call_tool(tool_call_name, tool_call_json)
-        if tool_call_result is None:
-            continue
-
-        logger.debug(
-            f"tool call result for {tool_call_name}: {tool_call_result.model_dump()}"
-        )
 
-        logger.debug(f"tool call result content: {tool_call_result.content}")
+        except TimeoutException:
+            if not budget.expired():
+                raise
+            # the next round ends the response
+            span.end("deadline")
 
-        tools_content = [
-            {"type": "text", "text": part.text}
-            for part in filter(lambda x: x.type == "text", tool_call_result.content)
-        ]
-        if len(tools_content) == 0:
-            tools_content = [{"type": "text", "text": "the tool call result is empty"}]
-        request.messages.append(
-            ChatCompletionRequestMessage.model_validate(
-                {
-                    "role": "tool",
-                    "content": tools_content,
-                    "tool_call_id": tool_call_id,
-                }
-            )
-        )
+        finally:
+            # do not leave speculatively started calls running if the stream is abandoned
+            for tool_call in tool_calls.values():
+                if tool_call.task is not None and not tool_call.task.done():
+                    tool_call.task.cancel()
 
         logger.debug("sending next iteration of chat completion request")
 
+    agent_iterations.observe(iterations)
+
     # when done, send the final event
     logger.debug("sending final event")
     yield ServerSentEvent(event="message", data="[DONE]", id=None, retry=None)
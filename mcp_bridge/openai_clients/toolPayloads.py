@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from mcp.types import Tool
+from loguru import logger
+
+from mcp_clients.McpCatalog import McpCatalog, catalog
+from tool_mappers import mcp2openai
+from . import jsonCodec
+
+__all__ = ["tool_payloads", "encode_request"]
+
+MAX_BUNDLES = 64
+
+
+class ToolPayloads:
+    """OpenAI tool definitions kept in serialized form until their MCP definition changes
+
+    A bundle is the json array sent as the tools of a request. Bundles are memoized
+    per tool set, and with a fixed selection every request uses the same one.
+    """
+
+    def __init__(self, catalog: McpCatalog) -> None:
+        self.catalog = catalog
+        self.version: int = -1
+        self.fragments: dict[str, tuple[Tool, bytes]] = {}
+        self.bundles: OrderedDict[tuple[str, ...], bytes] = OrderedDict()
+
+    def sync(self) -> None:
+        """Drop the fragments of tools that were removed or redefined since the last call"""
+        if self.version == self.catalog.version:
+            return
+
+        current = {tool.name: tool for tool in self.catalog.get_tools()}
+        dropped = 0
+        for name, (tool, fragment) in list(self.fragments.items()):
+            new = current.get(name)
+            if new is None or (new is not tool and new != tool):
+                del self.fragments[name]
+                dropped += 1
+            elif new is not tool:
+                self.fragments[name] = (new, fragment)
+
+        # a bundle may hold any of the dropped fragments
+        self.bundles.clear()
+        self.version = self.catalog.version
+        logger.debug(f"tool payloads updated, {dropped} tools to serialize again")
+
+    def fragment(self, tool: Tool) -> bytes:
+        entry = self.fragments.get(tool.name)
+        if entry is None:
+            entry = (tool, jsonCodec.dumps(mcp2openai(tool).model_dump(mode="json", exclude_none=True)))
+            self.fragments[tool.name] = entry
+        return entry[1]
+
+    def bundle(self, tools: list[Tool]) -> bytes:
+        """The json array of the tools, tools must come from the current catalog"""
+        self.sync()
+
+        key = tuple(tool.name for tool in tools)
+        bundle = self.bundles.get(key)
+        if bundle is not None:
+            self.bundles.move_to_end(key)
+            return bundle
+
+        bundle = b"[" + b",".join(self.fragment(tool) for tool in tools) + b"]"
+        self.bundles[key] = bundle
+        if len(self.bundles) > MAX_BUNDLES:
+            self.bundles.popitem(last=False)
+        return bundle
+
+
+tool_payloads: ToolPayloads = ToolPayloads(catalog)
+
+
+def encode_request(request: dict, tools: bytes) -> bytes:
+    """Serialize a chat completion request with a tools bundle spliced in"""
+    body = jsonCodec.dumps(request)
+    if body == b"{}":
+        return b'{"tools":' + tools + b"}"
+
+    # the body is a json object, the tools go in before its closing brace
+    return body[:-1] + b',"tools":' + tools + b"}"
@@ -0,0 +1,138 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from uuid import uuid4
+from loguru import logger
+import mcp.types
+
+from config import config
+from config.final import ToolResults, TruncationStrategy
+from metrics import tool_result_truncated_bytes, tool_result_truncations
+
+__all__ = ["ToolResultBudget", "ToolResultStore", "tool_result_store", "truncate"]
+
+TOKEN_BYTES = 4  # rough size of a token, good enough for a budget
+ELISION = "\n[...]\n"
+
+
+class ToolResultStore:
+    """Keeps the full version of truncated tool results so they can be fetched by reference"""
+
+    def __init__(self, settings: ToolResults) -> None:
+        self.settings = settings
+        # reference -> (expiry, size, result), oldest first
+        self.entries: OrderedDict[str, tuple[float, int, mcp.types.CallToolResult]] = OrderedDict()
+        self.bytes: int = 0
+
+    def put(self, result: mcp.types.CallToolResult, size: int) -> Optional[str]:
+        if size > self.settings.store_max_bytes:
+            logger.debug("not storing a tool result of {} bytes, it is over the store size", size)
+            return None
+
+        self._expire()
+        while self.entries and self.bytes + size > self.settings.store_max_bytes:
+            self._remove(next(iter(self.entries)))
+
+        reference = uuid4().hex
+        self.entries[reference] = (time.monotonic() + self.settings.store_ttl, size, result)
+        self.bytes += size
+        return reference
+
+    def get(self, reference: str) -> Optional[mcp.types.CallToolResult]:
+        entry = self.entries.get(reference)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[2]
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        # entries share one ttl, so the oldest ones expire first
+        while self.entries:
+            reference, (expiry, _, _) = next(iter(self.entries.items()))
+            if expiry >= now:
+                break
+            self._remove(reference)
+
+    def _remove(self, reference: str) -> None:
+        _, size, _ = self.entries.pop(reference)
+        self.bytes -= size
+
+
+tool_result_store: ToolResultStore = ToolResultStore(config.tool_results)
+
+
+def truncate(text: str, limit: int, strategy: TruncationStrategy) -> str:
+    """Cut text down to at most limit utf-8 bytes, keeping its head, its tail or both ends"""
+
+    data = text.encode("utf-8")
+    if len(data) <= limit:
+        return text
+
+    # a cut may split a character, the partial bytes are dropped
+    if strategy == "head" or (strategy == "middle" and limit <= len(ELISION)):
+        return data[:limit].decode("utf-8", "ignore")
+    if strategy == "tail":
+        return data[len(data) - limit:].decode("utf-8", "ignore")
+
+    limit -= len(ELISION)
+    head = limit // 2
+    return (
+        data[:head].decode("utf-8", "ignore")
+        + ELISION
+        + data[len(data) - (limit - head):].decode("utf-8", "ignore")
+    )
+
+
+class ToolResultBudget:
+    """Size budget for the tool results fed back to the model during one request
+
+    Each result is held to the limit of its tool, and to whatever is left of the
+    request budget. Results over the limit are truncated and the full version is
+    kept in the tool result store.
+    """
+
+    def __init__(self, settings: ToolResults = config.tool_results) -> None:
+        self.settings = settings
+        self.scale = TOKEN_BYTES if settings.unit == "tokens" else 1
+        self.remaining: Optional[int] = (
+            settings.request_max_size * self.scale if settings.request_max_size is not None else None
+        )
+
+    def limit(self, tool: str) -> Optional[int]:
+        """Bytes the next result of the tool may take up, None when unlimited"""
+        limits = []
+        size = self.settings.tool_max_size.get(tool, self.settings.max_size)
+        if size is not None:
+            limits.append(size * self.scale)
+        if self.remaining is not None:
+            limits.append(self.remaining)
+
+        return min(limits) if limits else None
+
+    def fit(self, tool: str, result: mcp.types.CallToolResult, text: str) -> str:
+        """Return the text of the result, truncated if it goes over the budget"""
+
+        limit = self.limit(tool)
+        size = len(text.encode("utf-8"))
+
+        if limit is None or size <= limit:
+            if self.remaining is not None:
+                self.remaining -= size
+            return text
+
+        strategy = self.settings.tool_strategy.get(tool, self.settings.strategy)
+        kept = truncate(text, limit, strategy)
+        kept_size = len(kept.encode("utf-8"))
+        if self.remaining is not None:
+            self.remaining = max(0, self.remaining - kept_size)
+
+        tool_result_truncations.labels(tool).inc()
+        tool_result_truncated_bytes.labels(tool).inc(size - kept_size)
+
+        reference = tool_result_store.put(result, size)
+        logger.debug("truncated result of {} from {} to {} bytes", tool, size, kept_size)
+
+        note = f"[truncated from {size // self.scale} to {kept_size // self.scale} {self.settings.unit}"
+        if reference is not None:
+            note += f", the full result is stored as {reference}"
+        return kept + "\n" + note + "]"
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from typing import Optional
+from fastapi import HTTPException
+from httpx import AsyncClient
+from loguru import logger
+from config import config
+from config.final import InferenceServer, Upstream as UpstreamConfig
+from models.upstreamPoolStatus import UpstreamStatus
+from .connectionPool import PoolStats
+from .genericHttpxClient import create_client
+
+__all__ = ["upstreams"]
+
+EWMA_ALPHA = 0.3  # weight of the newest latency sample
+
+
+class Upstream:
+    """An inference server along with its connection pool and health"""
+
+    def __init__(self, config: UpstreamConfig, settings: InferenceServer) -> None:
+        self.config = config
+        self.settings = settings
+        self.stats = PoolStats(settings.max_connections)
+        self.client: AsyncClient = create_client(
+            config.base_url, config.api_key, self.stats, self.record
+        )
+
+        self.latency_ewma: Optional[float] = None
+        self.failures: int = 0  # consecutive failures
+        self.ejected_until: float = 0.0
+
+    @property
+    def outstanding(self) -> int:
+        return self.stats.waiting + self.stats.in_use
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def record(self, latency: float, ok: bool) -> None:
+        """Record the outcome of a request, called by the transport"""
+        if ok:
+            self.failures = 0
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += EWMA_ALPHA * (latency - self.latency_ewma)
+            return
+
+        self.failures += 1
+        if self.failures >= self.settings.max_failures:
+            logger.warning(
+                f"ejecting {self.config.base_url} for {self.settings.ejection_seconds}s after {self.failures} failures"
+            )
+            self.ejected_until = time.monotonic() + self.settings.ejection_seconds
+
+    def load(self) -> float:
+        if self.settings.balancing == "ewma":
+            # unmeasured upstreams score zero so they get tried
+            return (self.latency_ewma or 0.0) * (self.outstanding + 1)
+
+        return self.outstanding
+
+    def status(self) -> UpstreamStatus:
+        return UpstreamStatus(
+            base_url=self.config.base_url,
+            models=self.config.models,
+            outstanding=self.outstanding,
+            latency_ewma=self.latency_ewma,
+            ejected=not self.available(),
+            pool=self.stats.status(),
+        )
+
+
+class UpstreamRouter:
+    """Routes requests to inference servers by model and balances between replicas"""
+
+    def __init__(self, settings: InferenceServer) -> None:
+        configs = settings.upstreams or [
+            UpstreamConfig(base_url=settings.base_url, api_key=settings.api_key)
+        ]
+        self.upstreams = [Upstream(upstream, settings) for upstream in configs]
+
+    def select(self, model: Optional[str]) -> Upstream:
+        # upstreams that name the model are preferred over catch-all ones
+        candidates = [u for u in self.upstreams if u.config.models and model in u.config.models]
+        if not candidates:
+            candidates = [u for u in self.upstreams if not u.config.models]
+
+        if not candidates:
+            raise HTTPException(
+                status_code=404, detail=f"Model '{model}' is not served by any inference server"
+            )
+
+        # when every candidate is ejected, trying one beats failing outright
+        healthy = [u for u in candidates if u.available()] or candidates
+        return min(healthy, key=lambda u: u.load())
+
+    @property
+    def routes_by_model(self) -> bool:
+        """Whether the choice of upstream depends on the requested model"""
+        return any(u.config.models for u in self.upstreams)
+
+    def client_for(self, model: Optional[str]) -> AsyncClient:
+        return self.select(model).client
+
+    async def list_models(self) -> dict:
+        """Merge the model lists of all upstreams"""
+
+        async def fetch(upstream: Upstream) -> list[dict]:
+            try:
+                response = await upstream.client.get("/models")
+                response.raise_for_status()
+                return response.json().get("data", [])
+            except Exception as e:
+                logger.error(f"error listing models of {upstream.config.base_url}: {e}")
+                return []
+
+        models: dict[str, dict] = {}
+        for data in await asyncio.gather(*(fetch(u) for u in self.upstreams)):
+            for model in data:
+                models.setdefault(model.get("id"), model)
+
+        return {"object": "list", "data": list(models.values())}
+
+    def status(self) -> list[UpstreamStatus]:
+        return [upstream.status() for upstream in self.upstreams]
+
+    async def aclose(self) -> None:
+        for upstream in self.upstreams:
+            await upstream.client.aclose()
+
+
+upstreams: UpstreamRouter = UpstreamRouter(config.inference_server)
@@ -1,51 +1,233 @@
 import asyncio
-from typing import Optional
+from typing import Any, Optional
 from loguru import logger
-from lmos_openai_types import CreateChatCompletionRequest
 import mcp.types
 import json
 
+from config import config
 from mcp_clients.McpClientManager import ClientManager
-from tool_mappers import mcp2openai
+from mcp_clients.ToolIndex import tool_index
+from tracing import start_span
+from .toolPayloads import tool_payloads
+from .toolResults import ToolResultBudget
 
+# limits shared by every request so a burst of parallel tool calls cannot swamp the servers
+tool_call_limit = asyncio.Semaphore(config.tool_calls.max_concurrency)
+server_call_limits: dict[str, asyncio.Semaphore] = {}
 
-async def chat_completion_add_tools(request: CreateChatCompletionRequest):
-    request.tools = []
 
-    for _, session in ClientManager.get_clients():
-        # if session is None, then the client is not running
-        if session.session is None:
-            logger.error(f"session is `None` for {session.name}")
+async def chat_completion_tools(request: dict, selection: Optional[str] = None) -> bytes:
+    """The serialized tools for a request, to be spliced into its body with encode_request"""
+
+    # tools sent by the client are replaced with the bridge's
+    request.pop("tools", None)
+
+    # the catalog is kept up to date by the clients, so this does not need any MCP calls
+    span = start_span("catalog")
+    tools = select_tools(request["messages"], selection)
+    bundle = tool_payloads.bundle(tools)
+    span.attributes["tools"] = len(tools)
+    span.end()
+
+    return bundle
+
+
+def select_tools(messages: list, selection: Optional[str] = None) -> list[mcp.types.Tool]:
+    """The tools sent with a request, narrowed down to the ones relevant to its latest messages
+
+    selection is the per request override from the tool selection header.
+    """
+
+    tools = ClientManager.get_tools()
+    settings = config.tool_selection
+    top_k = settings.top_k
+    names: Optional[set[str]] = None
+
+    if selection:
+        selection = selection.strip()
+        if selection.lower() == "all":
+            return tools
+        if selection.isdigit():
+            top_k = int(selection)
+        else:
+            names = {name.strip() for name in selection.split(",") if name.strip()}
+
+    if names is None:
+        if top_k is None or len(tools) <= top_k:
+            return tools
+
+        query = message_text(messages[-settings.recent_messages:])
+        names = set(tool_index.search(query, top_k))
+
+        # messages that match few tools, like a greeting, still get top_k of them
+        for tool in tools:
+            if len(names) >= top_k:
+                break
+            names.add(tool.name)
+
+        names.update(settings.always_include)
+
+    # the catalog order is kept so the same selection always serializes the same way
+    return [tool for tool in tools if tool.name in names]
+
+
+def message_text(messages: list) -> str:
+    """The text of chat messages, including the names of the tools they called"""
+
+    parts: list[str] = []
+    for message in messages:
+        if not isinstance(message, dict):
             continue
 
-        tools = await session.session.list_tools()
-        for tool in tools.tools:
-            request.tools.append(mcp2openai(tool))
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(
+                part["text"] for part in content if isinstance(part, dict) and isinstance(part.get("text"), str)
+            )
+
+        tool_calls = message.get("tool_calls")
+        if isinstance(tool_calls, list):
+            for tool_call in tool_calls:
+                function = tool_call.get("function") if isinstance(tool_call, dict) else None
+                if isinstance(function, dict) and isinstance(function.get("name"), str):
+                    parts.append(function["name"])
+
+    return " ".join(parts)
 
-    return request
+
+def tool_call_fields(tool_call: Any) -> tuple[Any, Any, Any]:
+    """The id, name and json arguments of an upstream tool call, None for any that are missing"""
+
+    if not isinstance(tool_call, dict):
+        return None, None, None
+
+    function = tool_call.get("function")
+    if not isinstance(function, dict):
+        return tool_call.get("id"), None, None
+
+    return tool_call.get("id"), function.get("name"), function.get("arguments")
 
 
 async def call_tool(
-    tool_call_name: str, tool_call_json: str, timeout: Optional[int] = None
-) -> Optional[mcp.types.CallToolResult]:
-    if tool_call_name == "" or tool_call_name is None:
+    tool_call_name: Any, tool_call_json: Any, timeout: Optional[float] = None
+) -> mcp.types.CallToolResult:
+    # every tool call gets a result, the inference server rejects calls left unanswered
+    if not isinstance(tool_call_name, str) or tool_call_name == "":
         logger.error("tool call name is empty")
-        return None
+        return tool_error("tool", "the tool call has no name")
 
-    if tool_call_json is None:
+    if not isinstance(tool_call_json, str):
         logger.error("tool call json is empty")
-        return None
+        return tool_error(tool_call_name, "the tool call has no arguments")
 
-    session = await ClientManager.get_client_from_tool(tool_call_name)
+    session = ClientManager.get_client_from_tool(tool_call_name)
 
     if session is None:
         logger.error(f"session is `None` for {tool_call_name}")
-        return None
+        return tool_error(tool_call_name, "no server provides this tool")
 
     try:
         tool_call_args = json.loads(tool_call_json)
     except json.JSONDecodeError:
         logger.error(f"failed to decode json for {tool_call_name}")
-        return None
+        return tool_error(tool_call_name, "the arguments are not valid json")
+
+    server_limit = server_call_limits.setdefault(
+        session.name, asyncio.Semaphore(config.tool_calls.max_concurrency_per_server)
+    )
+
+    # a request out of time does not queue for a slot it could not use
+    if timeout is not None and timeout <= 0:
+        return out_of_time(tool_call_name)
+
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    try:
+        # the timeout covers the wait for a free slot, not only the call
+        async with asyncio.timeout_at(deadline):
+            await tool_call_limit.acquire()
+            try:
+                await server_limit.acquire()
+            except BaseException:
+                tool_call_limit.release()
+                raise
+    except asyncio.TimeoutError:
+        return out_of_time(tool_call_name)
+
+    try:
+        remaining = None if deadline is None else deadline - loop.time()
+        if remaining is not None and remaining <= 0:
+            return out_of_time(tool_call_name)
+        return await session.call_tool(tool_call_name, tool_call_args, remaining)
+    finally:
+        server_limit.release()
+        tool_call_limit.release()
+
+
+def out_of_time(name: str) -> mcp.types.CallToolResult:
+    logger.error(f"no time left to call tool: {name}")
+    return mcp.types.CallToolResult(
+        content=[mcp.types.TextContent(type="text", text=f"Timeout Error calling {name}")],
+        isError=True,
+    )
+
+
+async def call_tools(
+    tool_calls: list[tuple[Any, Any]], timeout: Optional[float] = None
+) -> list[mcp.types.CallToolResult]:
+    """Run (name, json arguments) tool calls concurrently, results keep the order of the calls"""
+
+    results = await asyncio.gather(
+        *(call_tool(name, arguments, timeout) for name, arguments in tool_calls),
+        return_exceptions=True,  # a failing call must not cancel its siblings
+    )
+
+    call_results: list[mcp.types.CallToolResult] = []
+    for (name, _), result in zip(tool_calls, results):
+        if isinstance(result, BaseException):
+            result = tool_call_error(name, result)
+
+        call_results.append(result)
+
+    return call_results
+
+
+def tool_call_error(name: str, error: BaseException) -> mcp.types.CallToolResult:
+    """Turn an exception raised by a tool call into an error result for the model"""
+
+    logger.error(f"error calling {name}: {error}")
+    return tool_error(name, str(error))
+
+
+def tool_error(name: str, message: str) -> mcp.types.CallToolResult:
+    return mcp.types.CallToolResult(
+        content=[mcp.types.TextContent(type="text", text=f"Error calling {name}: {message}")],
+        isError=True,
+    )
+
+
+def tool_result_message(
+    tool_call_id: str,
+    tool_call_name: str,
+    tool_call_result: mcp.types.CallToolResult,
+    budget: ToolResultBudget,
+) -> dict:
+    """Build the tool message that feeds a tool call result back to the model"""
+
+    texts = [part.text for part in tool_call_result.content if part.type == "text"]
+    if len(texts) == 0:
+        texts = ["the tool call result is empty"]
+
+    if budget.limit(tool_call_name) is not None:
+        # the parts are budgeted as a whole, so a long result ends up as a single part
+        texts = [budget.fit(tool_call_name, tool_call_result, "\n".join(texts))]
+
+    tools_content = [{"type": "text", "text": text} for text in texts]
 
-    return await session.call_tool(tool_call_name, tool_call_args, timeout)
+    return {
+        "role": "tool",
+        "content": tools_content,
+        "tool_call_id": tool_call_id,
+    }
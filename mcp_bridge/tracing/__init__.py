@@ -0,0 +1,14 @@
+from .context import current_request_id, current_trace, start_span
+from .exporters import SpanExporter
+from .middleware import TracingMiddleware
+from .types import Span, Trace
+
+__all__ = [
+    "current_request_id",
+    "current_trace",
+    "start_span",
+    "SpanExporter",
+    "TracingMiddleware",
+    "Span",
+    "Trace",
+]
@@ -0,0 +1,19 @@
+from contextvars import ContextVar
+from typing import Any, Optional
+from .types import Span, Trace
+
+__all__ = ["current_trace", "current_request_id", "start_span"]
+
+# set by the tracing middleware for the duration of a request, tasks started
+# while serving it inherit it
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    trace = current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def start_span(name: str, **attributes: Any) -> Span:
+    """Start timing a stage, the span is recorded on the current request once it ends"""
+    return Span(name, attributes, current_trace.get())
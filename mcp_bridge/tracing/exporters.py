@@ -0,0 +1,84 @@
+import importlib
+import json
+import queue
+import sys
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional, TextIO
+from loguru import logger
+from .types import Trace
+
+__all__ = ["SpanExporter", "StdoutExporter", "FileExporter", "load_exporter"]
+
+
+class SpanExporter(ABC):
+    """Receives every finished request trace
+
+    Custom exporters subclass this and are configured as "package.module:ClassName".
+    """
+
+    @abstractmethod
+    def export(self, trace: Trace) -> None:
+        pass
+
+
+class JsonLinesExporter(SpanExporter):
+    """Writes each trace as a line of json to a stream from a background thread
+
+    export runs on the event loop, so the trace is only queued there and the
+    encoding and the blocking write happen on the writer thread.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+        self.queue: queue.SimpleQueue[dict] = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._write, name="trace-exporter", daemon=True)
+        self.writer.start()
+
+    def export(self, trace: Trace) -> None:
+        self.queue.put(trace.to_dict())
+
+    def _write(self) -> None:
+        while True:
+            trace = self.queue.get()
+            try:
+                self.stream.write(json.dumps(trace) + "\n")
+                self.stream.flush()
+            except Exception as e:
+                logger.error(f"failed to export trace: {e}")
+
+
+class StdoutExporter(JsonLinesExporter):
+    """Writes each trace as a line of json to stdout"""
+
+    def __init__(self) -> None:
+        super().__init__(sys.stdout)
+
+
+class FileExporter(JsonLinesExporter):
+    """Appends each trace as a line of json to a file"""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(open(path, "a", encoding="utf-8"))
+
+
+def load_exporter(name: str, path: str) -> Optional[SpanExporter]:
+    if name == "none":
+        return None
+    if name == "stdout":
+        return StdoutExporter()
+    if name == "file":
+        return FileExporter(path)
+
+    module, _, attribute = name.partition(":")
+    try:
+        exporter = getattr(importlib.import_module(module), attribute)()
+    except Exception as e:
+        logger.error(f"could not load trace exporter {name}: {e}")
+        return None
+
+    if not isinstance(exporter, SpanExporter):
+        logger.error(f"trace exporter {name} is not a SpanExporter")
+        return None
+
+    return exporter
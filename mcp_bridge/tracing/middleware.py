@@ -0,0 +1,79 @@
+import random
+import re
+from uuid import uuid4
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import config
+from config.logs import debug_sampled
+from .context import current_trace
+from .exporters import load_exporter
+from .types import Trace
+
+__all__ = ["TracingMiddleware"]
+
+# ids taken from clients end up in headers and logs, so only plain tokens are accepted
+REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+class TracingMiddleware:
+    """Assigns every request an id, records its spans and exports the trace
+
+    The id is taken from the request id header when present, and echoed back along
+    with a Server-Timing header. Streamed responses send their headers before the
+    agent loop runs, so their Server-Timing only covers the stages before the stream.
+    Requests tagged with the debug header, or picked by the debug sample rate, are
+    logged at debug level.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.settings = config.tracing
+        self.header = self.settings.request_id_header.lower().encode("latin-1")
+        self.exporter = load_exporter(self.settings.exporter, self.settings.file)
+
+        debug_header = config.logging.debug_header
+        self.debug_header = debug_header.lower().encode("latin-1") if debug_header else None
+        self.debug_sample_rate = config.logging.debug_sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        debug = self.debug_sample_rate > 0 and random.random() < self.debug_sample_rate
+        for name, value in scope["headers"]:
+            if name == self.header:
+                request_id = value.decode("latin-1")
+            elif name == self.debug_header and value.lower() == b"true":
+                debug = True
+
+        if request_id is None or not REQUEST_ID.match(request_id):
+            request_id = uuid4().hex
+
+        trace = Trace(request_id, scope["method"], scope["path"])
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((self.header, request_id.encode("latin-1")))
+                if self.settings.server_timing and trace.spans:
+                    headers.append((b"server-timing", trace.server_timing().encode("latin-1", errors="replace")))
+                message = {**message, "headers": headers}
+
+            await send(message)
+
+        token = current_trace.set(trace)
+        debug_token = debug_sampled.set(debug)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            debug_sampled.reset(debug_token)
+            current_trace.reset(token)
+            trace.end()
+
+            if self.exporter is not None and trace.spans:
+                try:
+                    self.exporter.export(trace)
+                except Exception as e:
+                    logger.error(f"failed to export trace {request_id}: {e}")
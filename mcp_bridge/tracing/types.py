@@ -0,0 +1,77 @@
+import time
+from typing import Any, Optional
+
+__all__ = ["Span", "Trace"]
+
+
+class Span:
+    """A timed stage of a request"""
+
+    __slots__ = ("name", "attributes", "start", "duration", "error", "_trace")
+
+    def __init__(self, name: str, attributes: dict[str, Any], trace: Optional["Trace"]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self._trace = trace
+
+    def end(self, error: Optional[str] = None) -> None:
+        if self.duration is not None:
+            return
+
+        self.duration = time.perf_counter() - self.start
+        self.error = error
+
+        if self._trace is not None:
+            self._trace.spans.append(self)
+
+    def to_dict(self, origin: float) -> dict:
+        return {
+            "name": self.name,
+            "attributes": self.attributes,
+            "offset": self.start - origin,
+            "duration": self.duration,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """The spans recorded while serving one request"""
+
+    def __init__(self, request_id: str, method: str, path: str) -> None:
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: list[Span] = []  # in the order they ended
+
+    def end(self) -> None:
+        self.duration = time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """Summarize the finished spans as a Server-Timing header value"""
+        entries = []
+        for span in self.spans:
+            entry = f"{span.name};dur={span.duration * 1000:.1f}"  # type: ignore
+            description = span.attributes.get("tool") or span.attributes.get("round")
+            if description is not None:
+                # header values are latin-1, keep the description to printable ascii
+                # without the quotes and backslashes that would end the quoted string
+                text = "".join(c for c in str(description) if " " <= c <= "~" and c not in '"\\')
+                entry += f';desc="{text}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "timestamp": self.timestamp,
+            "duration": self.duration,
+            "spans": [span.to_dict(self.start) for span in self.spans],
+        }